@@ -1,16 +1,61 @@
 import os
 from collections.abc import AsyncGenerator
+from typing import Optional
 
+from app.utils.pool_stats import PoolStatsListener
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
 load_dotenv()
 db_uri = os.getenv("MONGODB_URI")
+DB_NAME = os.getenv("MONGODB_DB_NAME", "anime_recommendation")
+
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(
+    os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000")
+)
+
+pool_stats = PoolStatsListener()
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def connect_to_mongo() -> AsyncIOMotorClient:
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            db_uri,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=[pool_stats],
+        )
+    return _client
+
+
+def close_mongo_connection():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+        pool_stats.reset()
+
+
+def get_db() -> AsyncIOMotorDatabase:
+    return connect_to_mongo()[DB_NAME]
 
 
 async def get_database() -> AsyncGenerator[AsyncIOMotorDatabase, None]:
-    client = AsyncIOMotorClient(db_uri)
-    try:
-        yield client.anime_recommendation
-    finally:
-        client.close()
+    yield get_db()
+
+
+def get_pool_stats() -> dict:
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        **pool_stats.snapshot(),
+    }
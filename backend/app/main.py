@@ -1,13 +1,48 @@
-from app.routers import animes, ping, watchlist
+import time
+from contextlib import asynccontextmanager
+
+from app.dependencies import close_mongo_connection, connect_to_mongo, get_db
+from app.routers import animes, metrics, ping, recommendations, watchlist
+from app.utils.auth0_security import jwks_manager
+from app.utils.catalog_sync import catalog_sync
+from app.utils.indexes import ensure_indexes
+from app.utils.metrics import request_seconds
+from app.utils.title_search import title_index
+from app.utils.vector_search import vector_index
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    connect_to_mongo()
+    jwks_manager.start()
+    try:
+        await ensure_indexes(get_db())
+        await catalog_sync.mark(get_db())
+        await vector_index.load(get_db())
+        await title_index.load(get_db())
+    except Exception as e:
+        print("Error preparing database on startup:", e)
+    catalog_sync.start()
+    try:
+        yield
+    finally:
+        await catalog_sync.stop()
+        await jwks_manager.stop()
+        close_mongo_connection()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(animes.router, prefix="/v1/animes", tags=["animes"])
 app.include_router(ping.router, prefix="/v1/ping", tags=["ping"])
 app.include_router(watchlist.router, prefix="/v1/watchlist", tags=["watchlist"])
+app.include_router(
+    recommendations.router, prefix="/v1/recommendations", tags=["recommendations"]
+)
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +53,42 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    started = time.perf_counter()
+
+    def observe(status_code: int):
+        # Label by route template, not raw path, to keep the series bounded.
+        route = request.scope.get("route")
+        request_seconds.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status_code),
+        )
+
+    try:
+        response = await call_next(request)
+    except Exception:
+        observe(500)
+        raise
+
+    body = response.body_iterator
+
+    async def observed_body():
+        # call_next returns once headers are ready; streaming routes such as
+        # /chatbot/stream do most of their work after that, so stop the
+        # clock when the last chunk has been sent.
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            observe(response.status_code)
+
+    response.body_iterator = observed_body()
+    return response
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(requests: Request, exc: Exception):
     return JSONResponse(status_code=500, content={"message": str(exc)})
@@ -1,25 +1,61 @@
-import random
+import asyncio
+import json
 from typing import Optional
+from uuid import uuid4
 
-import numpy as np
 from app.dependencies import get_database
 from app.schemas.animes import (
+    ANIME_OUT_PROJECTION,
     AVAILABLE_MODELS,
     AnimeListResponse,
+    AnimeSort,
     AnimeResponse,
     AnimesListResponse,
+    BatchRecommendationRequest,
+    BatchRecommendationResponse,
     ChatBotRequest,
     ChatBotResponse,
     GenresResponse,
     MessageResponse,
+    PaginationMode,
     QueryMode,
+    TotalMode,
 )
 from app.utils.anime_api import get_anime
-from app.utils.chatbot import openrouter_chatbot
-from app.utils.embeddings import generate_embeddings
+from app.utils.anime_filters import AnimeFilter
+from app.utils.anime_rows import (
+    collect_anime_out,
+    find_anime_out_by_ids,
+    sample_anime_out,
+    to_anime_out,
+)
+from app.utils.auth0_security import get_optional_user_id
+from app.utils.chatbot import (
+    chatbot_stats,
+    openrouter_chatbot,
+    stream_openrouter_chatbot,
+)
+from app.utils.embedding_codec import decode_embedding
+from app.utils.embeddings import generate_embeddings, generate_embeddings_batch
 from app.utils.fetch_status import get_current_page, update_current_page
+from app.utils.metrics import timed
+from app.utils.neighbors import get_neighbor_ids, get_neighbor_ids_many
+from app.utils.pagination import (
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+    keyset_sort,
+    total_pages,
+)
+from app.utils.rank_fusion import reciprocal_rank_fusion
+from app.utils.response_cache import response_cache
+from app.utils.serialization import json_response
+from app.utils.title_search import TITLE_FILTER_LIMIT, title_index
 from app.utils.validate_params import validate_query_params
+from app.utils.vector_search import vector_index
+from app.utils.watchlists import get_watchlist_anime_ids
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 router = APIRouter()
@@ -28,89 +64,274 @@ router = APIRouter()
 @router.post(
     "/fetch", response_model=MessageResponse, status_code=status.HTTP_201_CREATED
 )
-async def fetch_animes(request: Request, perPage: int = 1):
+async def fetch_animes(
+    request: Request,
+    perPage: int = 1,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
     validate_query_params(request, {"perPage"})
-    page = await get_current_page()
-    result = await get_anime(page, perPage)
+    page = await get_current_page(db)
+    result = await get_anime(page, perPage, db)
 
     if result.get("status") != "success":
         raise HTTPException(
             status_code=500, detail=result.get("error") or "Failed to fetch animes"
         )
 
-    await update_current_page(page + 1)
+    await update_current_page(page + 1, db)
     return {"message": f"{result.get('inserted_ids')} animes inserted successfully"}
 
 
+async def watchlist_exclusions(db: AsyncIOMotorDatabase, user_id: Optional[str]):
+    if user_id is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Sign in with a valid token to exclude your watchlist",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_watchlist_anime_ids(db, user_id)
+
+
+# Modes whose vector results are fused with title matches for the query.
+# An anime_name query is the seed's own title, so name mode ranks by
+# embedding similarity alone, whether it is served from anime_neighbors or
+# by a live vector search.
+TITLE_FUSED_MODES = {QueryMode.description}
+
+
+def embedding_text(query: str, mode: QueryMode) -> str:
+    return f"Genres: {query}" if mode == QueryMode.genre else query
+
+
+async def fuse_title_hits(
+    db: AsyncIOMotorDatabase,
+    query: str,
+    results: list,
+    filters: AnimeFilter,
+    limit: int,
+) -> list:
+    """Merge vector ``results`` with title matches for ``query`` using RRF."""
+    title_ids = await title_index.search_ids(db, query, TITLE_FILTER_LIMIT)
+    title_hits = await find_anime_out_by_ids(
+        db.animes, title_ids, filters.to_mongo(), limit=limit
+    )
+    if not title_hits:
+        return results
+    docs = {anime["id"]: anime for anime in title_hits + results}
+    fused = reciprocal_rank_fusion(
+        [
+            [anime["id"] for anime in results],
+            [anime["id"] for anime in title_hits],
+        ]
+    )
+    return [docs[anime_id] for anime_id, _ in fused]
+
+
 @router.post("/recommendations", response_model=AnimeListResponse)
 async def recommend_anime(
     request: Request,
     query: str,
     mode: QueryMode = QueryMode.description,
     top_k: int = 5,
+    genre: Optional[str] = Query(None),
+    min_score: Optional[int] = Query(None),
+    max_score: Optional[int] = Query(None),
+    season: Optional[str] = Query(None),
+    year: Optional[int] = Query(None),
+    exclude_watchlist: bool = Query(False),
+    user_id: Optional[str] = Depends(get_optional_user_id),
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    validate_query_params(request, {"query", "mode", "top_k"})
+    validate_query_params(
+        request,
+        {
+            "query",
+            "mode",
+            "top_k",
+            "genre",
+            "min_score",
+            "max_score",
+            "season",
+            "year",
+            "exclude_watchlist",
+        },
+    )
     anime_collection = db.animes
+    filters = AnimeFilter(genre, min_score, max_score, season, year)
+    if exclude_watchlist:
+        filters.exclude_ids = await watchlist_exclusions(db, user_id)
 
     if mode == QueryMode.anime_name:
         anime = await anime_collection.find_one(
-            {"$or": [{"title.romaji": query.lower()}, {"title.english": query.lower()}]}
+            {
+                "$or": [
+                    {"title.romaji": query.lower()},
+                    {"title.english": query.lower()},
+                ]
+            },
+            {"_id": 0, "id": 1, "embedding": 1, "embedding_scale": 1},
         )
         if not anime:
             raise HTTPException(status_code=404, detail="Anime not found")
-        user_embedding = anime.get("embedding")
 
-    elif mode == QueryMode.genre:
-        user_embedding = await generate_embeddings(f"Genres: {query}")
+        # Served from the precomputed table when it has enough matches;
+        # otherwise fall through to a live vector search.
+        neighbor_ids = await get_neighbor_ids(db, anime["id"])
+        if neighbor_ids:
+            results = await find_anime_out_by_ids(
+                anime_collection, neighbor_ids, filters.to_mongo(), limit=top_k
+            )
+            if len(results) >= top_k:
+                return json_response({"results": results})
+
+        user_embedding = decode_embedding(
+            anime.get("embedding"), anime.get("embedding_scale")
+        )
+        # The seed is its own nearest match; never recommend it back.
+        filters.exclude_ids = [*filters.exclude_ids, anime["id"]]
+
     else:
-        user_embedding = await generate_embeddings(query)
+        user_embedding = await generate_embeddings(embedding_text(query, mode))
 
-    if isinstance(user_embedding, np.ndarray):
-        user_embedding = user_embedding.tolist()
+    if mode in TITLE_FUSED_MODES:
+        # Over-fetch both rankings so fusion can promote titles that are
+        # only moderately close in one of them.
+        results = await vector_index.search(
+            db, user_embedding, top_k * 2, filters=filters
+        )
+        results = await fuse_title_hits(db, query, results, filters, top_k * 2)
+    else:
+        results = await vector_index.search(db, user_embedding, top_k, filters=filters)
 
-    pipeline = [
-        {
-            "$vectorSearch": {
-                "index": "embeddings_vector_index",
-                "path": "embedding",
-                "queryVector": user_embedding,
-                "numCandidates": 100,
-                "limit": top_k,
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "id": 1,
-                "title": 1,
-                "description": 1,
-                "averageScore": 1,
-                "genres": 1,
-                "episodes": 1,
-                "duration": 1,
-                "season": 1,
-                "seasonYear": 1,
-                "status": 1,
-                "source": 1,
-                "studios": 1,
-                "coverImage": 1,
-                "score": {"$meta": "vectorSearchScore"},
-            }
-        },
+    results = [to_anime_out(anime) for anime in results[:top_k]]
+    if not results:
+        raise HTTPException(status_code=404, detail="No similar animes found")
+
+    return json_response({"results": results})
+
+
+@router.post("/recommendations/batch", response_model=BatchRecommendationResponse)
+async def recommend_anime_batch(
+    request: BatchRecommendationRequest,
+    user_id: Optional[str] = Depends(get_optional_user_id),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """Run several recommendation queries with shared database and model calls.
+
+    All text queries are embedded in one batched call, ``anime_name`` seeds
+    are resolved with one ``$in`` lookup, and the similarity searches run
+    together. A query that finds nothing gets an ``error`` instead of
+    failing the whole batch.
+    """
+    queries = request.queries
+    exclude_ids = []
+    if request.exclude_watchlist:
+        exclude_ids = await watchlist_exclusions(db, user_id)
+    filters = [
+        AnimeFilter(q.genre, q.min_score, q.max_score, q.season, q.year, exclude_ids)
+        for q in queries
     ]
+    results: list = [None] * len(queries)
+    errors: list = [None] * len(queries)
+    vectors: list = [None] * len(queries)
+
+    name_queries = [i for i, q in enumerate(queries) if q.mode == QueryMode.anime_name]
+    if name_queries:
+        names = list({queries[i].query.lower() for i in name_queries})
+        seeds = {}
+        async for anime in db.animes.find(
+            {
+                "$or": [
+                    {"title.romaji": {"$in": names}},
+                    {"title.english": {"$in": names}},
+                ]
+            },
+            {"_id": 0, "id": 1, "title": 1, "embedding": 1, "embedding_scale": 1},
+        ):
+            for title in (anime["title"].get("romaji"), anime["title"].get("english")):
+                seeds.setdefault(title, anime)
+
+        seed_of = {
+            i: seeds[queries[i].query.lower()]
+            for i in name_queries
+            if queries[i].query.lower() in seeds
+        }
+        for i in set(name_queries) - set(seed_of):
+            errors[i] = "Anime not found"
 
-    cursor = anime_collection.aggregate(pipeline)
-    results = [doc async for doc in cursor]
+        # Served from the precomputed table when it has enough matches.
+        neighbors = await get_neighbor_ids_many(
+            db, list({seed["id"] for seed in seed_of.values()})
+        )
+        tabled = [i for i, seed in seed_of.items() if seed["id"] in neighbors]
+        from_table = await asyncio.gather(
+            *(
+                find_anime_out_by_ids(
+                    db.animes,
+                    neighbors[seed_of[i]["id"]],
+                    filters[i].to_mongo(),
+                    limit=queries[i].top_k,
+                )
+                for i in tabled
+            )
+        )
+        for i, rows in zip(tabled, from_table):
+            if len(rows) >= queries[i].top_k:
+                results[i] = rows
+        for i, seed in seed_of.items():
+            if results[i] is None:
+                vectors[i] = decode_embedding(
+                    seed.get("embedding"), seed.get("embedding_scale")
+                )
+                # A fresh list: the watchlist ids are shared between queries.
+                filters[i].exclude_ids = [*filters[i].exclude_ids, seed["id"]]
+
+    text_queries = [i for i, q in enumerate(queries) if q.mode != QueryMode.anime_name]
+    embeddings = []
+    if text_queries:
+        embeddings = await generate_embeddings_batch(
+            [embedding_text(queries[i].query, queries[i].mode) for i in text_queries]
+        )
+    for i, embedding in zip(text_queries, embeddings):
+        vectors[i] = embedding
+        if embedding is None:
+            errors[i] = "Could not embed the query"
 
-    if not results:
-        raise HTTPException(status_code=404, detail="No similar animes found")
+    pending = [
+        i for i, vector in enumerate(vectors) if vector is not None and len(vector)
+    ]
+    titled = [i for i in pending if queries[i].mode in TITLE_FUSED_MODES]
+    searched = await vector_index.search_many(
+        db,
+        [vectors[i] for i in pending],
+        [queries[i].top_k * (2 if i in titled else 1) for i in pending],
+        [filters[i] for i in pending],
+    )
+    for i, rows in zip(pending, searched):
+        results[i] = rows
+    fused = await asyncio.gather(
+        *(
+            fuse_title_hits(
+                db, queries[i].query, results[i], filters[i], queries[i].top_k * 2
+            )
+            for i in titled
+        )
+    )
+    for i, rows in zip(titled, fused):
+        results[i] = rows
 
-    return {"results": results}
+    batch = []
+    for query, rows, error in zip(queries, results, errors):
+        rows = [to_anime_out(anime) for anime in (rows or [])[: query.top_k]]
+        if not rows and error is None:
+            error = "No similar animes found"
+        batch.append({"results": rows, "error": error})
+    return json_response({"results": batch})
 
 
 @router.get("", response_model=AnimesListResponse)
 async def get_animes(
+    request: Request,
     page: int = Query(1, ge=1),
     per_page: int = Query(12, ge=1, le=100),
     genre: Optional[str] = Query(None),
@@ -119,73 +340,102 @@ async def get_animes(
     season: Optional[str] = Query(None),
     year: Optional[int] = Query(None),
     query: Optional[str] = Query(None),
+    sort: AnimeSort = Query(AnimeSort.inserted),
+    pagination: PaginationMode = Query(PaginationMode.offset),
+    cursor: Optional[str] = Query(None),
+    total_mode: Optional[TotalMode] = Query(None),
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    skip = (page - 1) * per_page
-    anime_collection = db.animes
-
-    mongo_query = {}
+    async def build():
+        return await list_animes(
+            page,
+            per_page,
+            AnimeFilter(genre, min_score, max_score, season, year),
+            query,
+            sort,
+            pagination,
+            cursor,
+            total_mode,
+            db,
+        )
 
-    if genre:
-        mongo_query["genres"] = genre
+    return await response_cache.respond(request, db, AnimesListResponse, build)
 
-    if min_score or max_score:
-        mongo_query["averageScore"] = {}
-        if min_score:
-            mongo_query["averageScore"]["$gte"] = min_score
-        if max_score:
-            mongo_query["averageScore"]["$lte"] = max_score
 
-    if season:
-        mongo_query["season"] = season.upper()
+async def list_animes(
+    page: int,
+    per_page: int,
+    filters: AnimeFilter,
+    query: Optional[str],
+    sort: AnimeSort,
+    pagination: PaginationMode,
+    cursor: Optional[str],
+    total_mode: Optional[TotalMode],
+    db: AsyncIOMotorDatabase,
+) -> dict:
+    anime_collection = db.animes
+    sort_field = "_id" if sort == AnimeSort.inserted else sort.value
+    use_cursor = pagination == PaginationMode.cursor or cursor is not None
+    if total_mode is None:
+        total_mode = TotalMode.none if use_cursor else TotalMode.exact
 
-    if year:
-        mongo_query["seasonYear"] = year
+    mongo_query = filters.to_mongo()
 
     if query:
-        mongo_query["$or"] = [
-            {"title.romaji": {"$regex": query, "$options": "i"}},
-            {"title.english": {"$regex": query, "$options": "i"}},
-        ]
-
-    total = await anime_collection.count_documents(mongo_query)
-    cursor = anime_collection.find(mongo_query).skip(skip).limit(per_page)
+        mongo_query["id"] = {
+            "$in": await title_index.search_ids(
+                db, query, TITLE_FILTER_LIMIT, candidates=None
+            )
+        }
 
-    results = []
-    async for anime in cursor:
-        results.append(
-            {
-                "id": anime["id"],
-                "title": anime["title"],
-                "description": anime["description"],
-                "averageScore": anime["averageScore"],
-                "genres": anime["genres"],
-                "episodes": anime["episodes"],
-                "duration": anime["duration"],
-                "season": anime["season"],
-                "seasonYear": anime["seasonYear"],
-                "status": anime["status"],
-                "source": anime["source"],
-                "studios": anime["studios"],
-                "coverImage": anime["coverImage"],
-            }
+    with timed("mongo_count"):
+        if total_mode == TotalMode.exact or (
+            total_mode == TotalMode.estimated and mongo_query
+        ):
+            total = await anime_collection.count_documents(mongo_query)
+        elif total_mode == TotalMode.estimated:
+            total = await anime_collection.estimated_document_count()
+        else:
+            total = None
+
+    if use_cursor:
+        # Keyset pagination: resume after the last (sort key, _id) seen, so
+        # every page costs the same as the first one.
+        if cursor:
+            last_value, last_id = decode_cursor(cursor, sort_field)
+            after = keyset_filter(sort_field, last_value, last_id)
+            mongo_query = {"$and": [mongo_query, after]} if mongo_query else after
+
+        with timed("mongo_find"):
+            rows = (
+                await anime_collection.find(
+                    mongo_query, {**ANIME_OUT_PROJECTION, "_id": 1}
+                )
+                .sort(keyset_sort(sort_field))
+                .limit(per_page + 1)
+                .to_list(length=per_page + 1)
+            )
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        results = [to_anime_out(anime) for anime in rows]
+        next_cursor = encode_cursor(sort_field, rows[-1]) if has_more else None
+    else:
+        animes = (
+            anime_collection.find(mongo_query, ANIME_OUT_PROJECTION)
+            .sort(keyset_sort(sort_field))
+            .skip((page - 1) * per_page)
+            .limit(per_page)
         )
-
-    if not results:
-        return {
-            "results": [],
-            "total": 0,
-            "page": page,
-            "perPage": per_page,
-            "totalPages": 0,
-        }
+        results = await collect_anime_out(animes)
+        next_cursor = None
 
     return {
         "results": results,
         "total": total,
         "page": page,
         "perPage": per_page,
-        "totalPages": (total + per_page - 1),
+        "totalPages": total_pages(total, per_page),
+        "nextCursor": next_cursor,
     }
 
 
@@ -219,48 +469,29 @@ async def suggest_anime(
 
 
 @router.get("/genres", response_model=GenresResponse)
-async def get_genres(db: AsyncIOMotorDatabase = Depends(get_database)):
-    anime_collection = db.animes
-    genres = await anime_collection.distinct("genres")
-    return {"genres": genres}
+async def get_genres(
+    request: Request, db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    async def build():
+        genres = await db.animes.distinct("genres")
+        return {"genres": genres}
 
+    return await response_cache.respond(request, db, GenresResponse, build)
 
-@router.get("/search", response_model=AnimeListResponse)
-async def search_anime(query: str, db: AsyncIOMotorDatabase = Depends(get_database)):
-    anime_collection = db.animes
-    animes = anime_collection.find(
-        {
-            "$or": [
-                {"title.romaji": {"$regex": query, "$options": "i"}},
-                {"title.english": {"$regex": query, "$options": "i"}},
-            ]
-        }
-    )
 
-    results = []
-    async for anime in animes:
-        results.append(
-            {
-                "id": anime["id"],
-                "title": anime["title"],
-                "description": anime["description"],
-                "averageScore": anime["averageScore"],
-                "genres": anime["genres"],
-                "episodes": anime["episodes"],
-                "duration": anime["duration"],
-                "season": anime["season"],
-                "seasonYear": anime["seasonYear"],
-                "status": anime["status"],
-                "source": anime["source"],
-                "studios": anime["studios"],
-                "coverImage": anime["coverImage"],
-            }
-        )
+@router.get("/search", response_model=AnimeListResponse)
+async def search_anime(
+    query: str,
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    anime_ids = await title_index.search_ids(db, query, limit)
+    results = await find_anime_out_by_ids(db.animes, anime_ids)
 
     if not results:
         raise HTTPException(status_code=404, detail="No animes found")
 
-    return {"results": results}
+    return json_response({"results": results})
 
 
 @router.get("/filter", response_model=AnimeListResponse)
@@ -274,55 +505,56 @@ async def filter_anime_by_genre(
     anime_collection = db.animes
     animes = (
         anime_collection.find(
-            {"genres": {"$elemMatch": {"$regex": f"^{genre}$", "$options": "i"}}}
+            {"genres": {"$elemMatch": {"$regex": f"^{genre}$", "$options": "i"}}},
+            ANIME_OUT_PROJECTION,
         )
         .skip(skip)
         .limit(limit)
     )
 
-    results = []
-
-    async for anime in animes:
-        results.append(
-            {
-                "id": anime["id"],
-                "title": anime["title"],
-                "description": anime["description"],
-                "averageScore": anime["averageScore"],
-                "genres": anime["genres"],
-                "episodes": anime["episodes"],
-                "duration": anime["duration"],
-                "season": anime["season"],
-                "seasonYear": anime["seasonYear"],
-                "status": anime["status"],
-                "source": anime["source"],
-                "studios": anime["studios"],
-                "coverImage": anime["coverImage"],
-            }
-        )
+    results = await collect_anime_out(animes)
 
     if not results:
         raise HTTPException(status_code=404, detail="No animes found for the genre")
 
-    return {"results": results}
+    return json_response({"results": results})
 
 
 @router.get("/random", response_model=AnimeResponse)
-async def get_random_anime(db: AsyncIOMotorDatabase = Depends(get_database)):
-    anime_collection = db.animes
-    count = await anime_collection.count_documents({})
+async def get_random_anime(
+    genre: Optional[str] = Query(None),
+    min_score: Optional[int] = Query(None),
+    max_score: Optional[int] = Query(None),
+    season: Optional[str] = Query(None),
+    year: Optional[int] = Query(None),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    filters = AnimeFilter(genre, min_score, max_score, season, year)
+    animes = await sample_anime_out(db.animes, filters.to_mongo(), 1)
 
-    if count == 0:
+    if not animes:
         raise HTTPException(status_code=404, detail="No animes found")
 
-    random_index = random.randint(0, count - 1)
-    anime = await anime_collection.find().skip(random_index).limit(1).to_list(length=1)
+    return json_response({"anime": animes[0]})
 
-    anime = anime[0]
-    anime.pop("_id", None)
-    anime.pop("embedding", None)
 
-    return {"anime": anime}
+@router.get("/random/picks", response_model=AnimeListResponse)
+async def get_random_picks(
+    count: int = Query(5, ge=1, le=50),
+    genre: Optional[str] = Query(None),
+    min_score: Optional[int] = Query(None),
+    max_score: Optional[int] = Query(None),
+    season: Optional[str] = Query(None),
+    year: Optional[int] = Query(None),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    filters = AnimeFilter(genre, min_score, max_score, season, year)
+    results = await sample_anime_out(db.animes, filters.to_mongo(), count)
+
+    if not results:
+        raise HTTPException(status_code=404, detail="No animes found")
+
+    return json_response({"results": results})
 
 
 @router.get("/top-rated", response_model=AnimeListResponse)
@@ -330,56 +562,42 @@ async def top_rated_anime(
     request: Request, limit: int = 10, db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     validate_query_params(request, {"limit"})
-    anime_collection = db.animes
-    animes = anime_collection.find({}).sort("averageScore", -1).limit(limit)
-
-    results = []
 
-    async for anime in animes:
-        results.append(
-            {
-                "id": anime["id"],
-                "title": anime["title"],
-                "description": anime["description"],
-                "averageScore": anime["averageScore"],
-                "genres": anime["genres"],
-                "episodes": anime["episodes"],
-                "duration": anime["duration"],
-                "season": anime["season"],
-                "seasonYear": anime["seasonYear"],
-                "status": anime["status"],
-                "source": anime["source"],
-                "studios": anime["studios"],
-                "coverImage": anime["coverImage"],
-            }
+    async def build():
+        animes = (
+            db.animes.find({}, ANIME_OUT_PROJECTION)
+            .sort("averageScore", -1)
+            .limit(limit)
         )
+        results = await collect_anime_out(animes)
+        if not results:
+            raise HTTPException(status_code=404, detail="No animes found")
+        return {"results": results}
 
-    if not results:
-        raise HTTPException(status_code=404, detail="No animes found")
-
-    return {"results": results}
+    return await response_cache.respond(request, db, AnimeListResponse, build)
 
 
 @router.get("/{anime_name}", response_model=AnimeResponse)
 async def get_anime_by_name_endpoint(
-    anime_name: str, db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    anime_name: str,
+    db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    anime_collection = db.animes
-    anime = await anime_collection.find_one(
-        {
-            "$or": [
-                {"title.romaji": anime_name.lower()},
-                {"title.english": anime_name.lower()},
-            ]
-        }
-    )
-    if not anime:
-        raise HTTPException(status_code=404, detail="Anime not found")
-
-    anime.pop("_id", None)
-    anime.pop("embedding", None)
+    async def build():
+        anime = await db.animes.find_one(
+            {
+                "$or": [
+                    {"title.romaji": anime_name.lower()},
+                    {"title.english": anime_name.lower()},
+                ]
+            },
+            ANIME_OUT_PROJECTION,
+        )
+        if not anime:
+            raise HTTPException(status_code=404, detail="Anime not found")
+        return {"anime": to_anime_out(anime)}
 
-    return {"anime": anime}
+    return await response_cache.respond(request, db, AnimeResponse, build)
 
 
 @router.get("/chatbot/models")
@@ -387,11 +605,40 @@ async def get_chatbot_models():
     return {"models": AVAILABLE_MODELS}
 
 
+@router.get("/chatbot/stats")
+async def get_chatbot_stats():
+    return chatbot_stats()
+
+
 @router.post("/chatbot", response_model=ChatBotResponse)
 async def Chatbot(
     request: ChatBotRequest, db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    results = await openrouter_chatbot(request.message, request.model_id, db)
+    session_id = request.session_id or uuid4().hex
+    results = await openrouter_chatbot(
+        request.message, request.model_id, db, session_id
+    )
     if not results:
         raise HTTPException(status_code=404, detail="No results found")
-    return {"results": results}
+    return {"results": results, "session_id": session_id}
+
+
+@router.post("/chatbot/stream")
+async def chatbot_stream(
+    request: ChatBotRequest, db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    session_id = request.session_id or uuid4().hex
+
+    async def events():
+        yield f"event: session\ndata: {json.dumps({'session_id': session_id})}\n\n"
+        async for delta in stream_openrouter_chatbot(
+            request.message, request.model_id, db, session_id
+        ):
+            yield f"data: {json.dumps({'delta': delta})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
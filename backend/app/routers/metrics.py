@@ -0,0 +1,18 @@
+from app.utils.auth0_security import token_cache
+from app.utils.embedding_cache import embedding_cache
+from app.utils.metrics import register_cache, registry
+from app.utils.response_cache import response_cache
+from app.utils.semantic_cache import semantic_cache
+from fastapi import APIRouter, Response
+
+router = APIRouter()
+
+register_cache("embedding", embedding_cache.stats)
+register_cache("semantic", semantic_cache.stats)
+register_cache("response", response_cache.stats)
+register_cache("token", token_cache.stats)
+
+
+@router.get("", include_in_schema=False)
+def metrics():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
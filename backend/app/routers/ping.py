@@ -1,3 +1,4 @@
+from app.dependencies import get_pool_stats
 from app.utils.auth0_security import get_current_user
 from fastapi import APIRouter, Depends
 
@@ -12,3 +13,8 @@ def ping():
 @router.get("/private")
 def private(user: dict = Depends(get_current_user)):
     return {"message": "Hello from a private endpoint!", "claims": user}
+
+
+@router.get("/db-pool")
+def db_pool():
+    return {"pool": get_pool_stats()}
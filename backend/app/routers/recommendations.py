@@ -0,0 +1,48 @@
+from typing import Optional
+
+from app.dependencies import get_database
+from app.schemas.animes import AnimeListResponse
+from app.utils.anime_filters import AnimeFilter
+from app.utils.anime_rows import to_anime_out
+from app.utils.auth0_security import get_current_user_id
+from app.utils.serialization import json_response
+from app.utils.taste import get_taste, listed_anime_ids, taste_vector
+from app.utils.validate_params import validate_query_params
+from app.utils.vector_search import vector_index
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+router = APIRouter()
+
+
+@router.get("/for-me", response_model=AnimeListResponse)
+async def recommend_for_me(
+    request: Request,
+    top_k: int = Query(10, ge=1, le=100),
+    genre: Optional[str] = Query(None),
+    min_score: Optional[int] = Query(None),
+    max_score: Optional[int] = Query(None),
+    season: Optional[str] = Query(None),
+    year: Optional[int] = Query(None),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    validate_query_params(
+        request, {"top_k", "genre", "min_score", "max_score", "season", "year"}
+    )
+    taste = await get_taste(db, user_id)
+    query_vector = taste_vector(taste)
+    if query_vector is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Mark anime as watching or completed to get recommendations",
+        )
+
+    filters = AnimeFilter(
+        genre, min_score, max_score, season, year, listed_anime_ids(taste)
+    )
+    results = await vector_index.search(db, query_vector, top_k, filters=filters)
+    if not results:
+        raise HTTPException(status_code=404, detail="No recommendations found")
+
+    return json_response({"results": [to_anime_out(anime) for anime in results]})
@@ -4,196 +4,153 @@ from typing import List, Optional
 from app.dependencies import get_database
 from app.schemas.animes import AnimeStatus
 from app.schemas.watchlist import (
+    ANIME_ID_PATTERN,
     Watchlist,
     WatchlistAnimeResponseItem,
     WatchlistItem,
     WatchlistResponse,
+    WatchlistSort,
 )
 from app.utils.auth0_security import get_current_user_id
-from fastapi import APIRouter, Depends, HTTPException
+from app.utils.taste import update_taste
+from app.utils.watchlists import watchlist_pipeline
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 router = APIRouter()
 
 
+async def refresh_taste(db, user_id: str, anime_id: str, status):
+    # The watchlist is the source of truth; a failed taste update only
+    # degrades /recommendations/for-me until the next change.
+    try:
+        await update_taste(db, user_id, anime_id, status)
+    except Exception as e:
+        print("Error updating taste vector:", e)
+
+
+async def raise_not_in_watchlist(db, user_id: str):
+    if await db.watchlist.count_documents({"user_id": user_id}, limit=1):
+        raise HTTPException(status_code=404, detail="Anime not found in watchlist")
+    raise HTTPException(status_code=404, detail="Watchlist not found")
+
+
 @router.post("/add", response_model=WatchlistResponse)
 async def add_to_watchlist(
-    anime_id: str,
+    anime_id: str = Query(..., pattern=ANIME_ID_PATTERN),
     user_anime_status: AnimeStatus = AnimeStatus.PLANNED,
     user_id: str = Depends(get_current_user_id),
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    watchlist_collection = db.watchlist
-    existing = await watchlist_collection.find_one({"user_id": user_id})
-
     new_item = WatchlistItem(
         anime_id=anime_id,
         watched_at=datetime.utcnow(),
         user_anime_status=user_anime_status,
     )
 
-    if existing:
-        for item in existing["animes"]:
-            if item["anime_id"] == anime_id:
-                raise HTTPException(
-                    status_code=400, detail="Anime already in watchlist"
-                )
-
-        existing["animes"].append(new_item.model_dump())
-        existing["updated_at"] = datetime.utcnow()
-
-        await watchlist_collection.update_one({"user_id": user_id}, {"$set": existing})
-        return WatchlistResponse(watchlist=Watchlist(**existing))
+    # Create the list first with an upsert keyed on user_id alone, so an
+    # existing list is matched rather than duplicated. The push then only
+    # matches while the anime is not listed yet, so a second add of the
+    # same anime is caught here instead of by the unique user_id index.
+    try:
+        await db.watchlist.update_one(
+            {"user_id": user_id},
+            {"$setOnInsert": {"animes": [], "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # A concurrent request created it first.
+        pass
+    watchlist = await db.watchlist.find_one_and_update(
+        {"user_id": user_id, "animes.anime_id": {"$ne": anime_id}},
+        {
+            "$push": {"animes": new_item.model_dump()},
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    if watchlist is None:
+        raise HTTPException(status_code=400, detail="Anime already in watchlist")
 
-    else:
-        new_watchlist = Watchlist(user_id=user_id, animes=[new_item])
-        await watchlist_collection.insert_one(new_watchlist.model_dump())
-        return WatchlistResponse(watchlist=new_watchlist)
+    await refresh_taste(db, user_id, anime_id, user_anime_status)
+    return WatchlistResponse(watchlist=Watchlist(**watchlist))
 
 
 @router.get("/", response_model=List[WatchlistAnimeResponseItem])
 async def get_watchlist(
+    page: int = Query(1, ge=1),
+    # Without per_page the whole list is returned, as before paging existed.
+    per_page: Optional[int] = Query(None, ge=1, le=500),
+    status: Optional[AnimeStatus] = Query(None),
+    sort: WatchlistSort = Query(WatchlistSort.newest),
     user_id: str = Depends(get_current_user_id),
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    watchlist_collection = db.watchlist
-    anime_collection = db.animes
-
-    existing = await watchlist_collection.find_one({"user_id": user_id})
-    if not existing:
-        return []
-
-    anime_ids_in_watchlist = [item["anime_id"] for item in existing["animes"]]
-    full_animes_cursor = anime_collection.find(
-        {"id": {"$in": [int(aid) for aid in anime_ids_in_watchlist]}}
+    pipeline = watchlist_pipeline(
+        user_id,
+        status=status.value if status else None,
+        newest_first=sort == WatchlistSort.newest,
+        skip=(page - 1) * per_page if per_page else 0,
+        limit=per_page,
     )
-    full_animes_data = await full_animes_cursor.to_list(length=None)
-
-    anime_data_map = {str(anime["id"]): anime for anime in full_animes_data}
-
-    combined_animes_response = []
-    for item in existing["animes"]:
-        anime_id = item["anime_id"]
-        if anime_id in anime_data_map:
-            full_anime = anime_data_map[anime_id]
-            combined_anime = WatchlistAnimeResponseItem(
-                id=full_anime.get("id"),
-                title=full_anime.get("title"),
-                description=full_anime.get("description"),
-                genres=full_anime.get("genres"),
-                averageScore=full_anime.get("averageScore"),
-                episodes=full_anime.get("episodes"),
-                duration=full_anime.get("duration"),
-                season=full_anime.get("season"),
-                seasonYear=full_anime.get("seasonYear"),
-                source=full_anime.get("source"),
-                studios=full_anime.get("studios"),
-                coverImage=full_anime.get("coverImage"),
-                user_anime_status=(
-                    AnimeStatus(item.get("user_anime_status"))
-                    if item.get("user_anime_status")
-                    else None
-                ),
-                watched_at=item.get("watched_at"),
-            )
-            combined_animes_response.append(combined_anime)
-
-    return combined_animes_response
+    return await db.watchlist.aggregate(pipeline).to_list(length=per_page)
 
 
 @router.get("/{anime_id}", response_model=Optional[WatchlistAnimeResponseItem])
 async def get_watchlist_item(
-    anime_id: str,
+    anime_id: str = Path(..., pattern=ANIME_ID_PATTERN),
     user_id: str = Depends(get_current_user_id),
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    watchlist_collection = db.watchlist
-    anime_collection = db.animes
-
-    existing = await watchlist_collection.find_one({"user_id": user_id})
-    if not existing:
-        return None
-
-    # find this anime in the user's list
-    for item in existing["animes"]:
-        if item["anime_id"] == anime_id:
-            # fetch full anime data
-            full_anime = await anime_collection.find_one({"id": int(anime_id)})
-            if not full_anime:
-                return None
-
-            return WatchlistAnimeResponseItem(
-                id=full_anime.get("id"),
-                title=full_anime.get("title"),
-                description=full_anime.get("description"),
-                genres=full_anime.get("genres"),
-                averageScore=full_anime.get("averageScore"),
-                episodes=full_anime.get("episodes"),
-                duration=full_anime.get("duration"),
-                season=full_anime.get("season"),
-                seasonYear=full_anime.get("seasonYear"),
-                source=full_anime.get("source"),
-                studios=full_anime.get("studios"),
-                coverImage=full_anime.get("coverImage"),
-                user_anime_status=(
-                    AnimeStatus(item.get("user_anime_status"))
-                    if item.get("user_anime_status")
-                    else None
-                ),
-                watched_at=item.get("watched_at"),
-            )
-
-    return None
+    pipeline = watchlist_pipeline(user_id, anime_id=anime_id, limit=1)
+    items = await db.watchlist.aggregate(pipeline).to_list(length=1)
+    return items[0] if items else None
 
 
 @router.delete("/{anime_id}", response_model=WatchlistResponse)
 async def delete_from_watchlist(
-    anime_id: str,
+    anime_id: str = Path(..., pattern=ANIME_ID_PATTERN),
     user_id: str = Depends(get_current_user_id),
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    watchlist_collection = db.watchlist
-
-    existing = await watchlist_collection.find_one({"user_id": user_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Watchlist not found")
-
-    update_animes = [a for a in existing["animes"] if a["anime_id"] != anime_id]
-    if len(update_animes) == len(existing["animes"]):
-        raise HTTPException(status_code=404, detail="Anime not found in watchlist")
-
-    existing["animes"] = update_animes
-    existing["updated_at"] = datetime.utcnow()
+    watchlist = await db.watchlist.find_one_and_update(
+        {"user_id": user_id, "animes.anime_id": anime_id},
+        {
+            "$pull": {"animes": {"anime_id": anime_id}},
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    if watchlist is None:
+        await raise_not_in_watchlist(db, user_id)
 
-    await watchlist_collection.update_one({"user_id": user_id}, {"$set": existing})
+    await refresh_taste(db, user_id, anime_id, None)
 
-    return WatchlistResponse(watchlist=Watchlist(**existing))
+    return WatchlistResponse(watchlist=Watchlist(**watchlist))
 
 
 @router.put("/{anime_id}", response_model=WatchlistResponse)
 async def update_watchlist_item(
-    anime_id: str,
     new_status: AnimeStatus,
+    anime_id: str = Path(..., pattern=ANIME_ID_PATTERN),
     user_id: str = Depends(get_current_user_id),
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    watchlist_collection = db.watchlist
-    existing = await watchlist_collection.find_one({"user_id": user_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Watchlist not found")
-
-    updated = False
-    for item in existing["animes"]:
-        if item["anime_id"] == anime_id:
-            item["user_anime_status"] = new_status
-            updated = True
-            break
-
-    if not updated:
-        raise HTTPException(status_code=404, detail="Anime not found in watchlist")
-
-    existing["updated_at"] = datetime.utcnow()
+    watchlist = await db.watchlist.find_one_and_update(
+        {"user_id": user_id, "animes.anime_id": anime_id},
+        {
+            "$set": {
+                "animes.$.user_anime_status": new_status.value,
+                "updated_at": datetime.utcnow(),
+            }
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    if watchlist is None:
+        await raise_not_in_watchlist(db, user_id)
 
-    await watchlist_collection.update_one({"user_id": user_id}, {"$set": existing})
+    await refresh_taste(db, user_id, anime_id, new_status)
 
-    return WatchlistResponse(watchlist=Watchlist(**existing))
+    return WatchlistResponse(watchlist=Watchlist(**watchlist))
@@ -28,6 +28,7 @@ class CoverImage(BaseModel):
 class Anime(BaseModel):
     id: Optional[int]
     title: Title
+    synonyms: List[str] = Field(default_factory=list)
     description: Optional[str]
     genres: List[str]
     averageScore: Optional[int] = None
@@ -40,6 +41,8 @@ class Anime(BaseModel):
     studios: Optional[List[str]] = Field(default_factory=list)
     coverImage: Optional[CoverImage] = None
     embedding: Optional[List[float]] = Field(default_factory=list)
+    # Set when the embedding is stored as an int8 binary vector.
+    embedding_scale: Optional[float] = None
 
 
 class AnimeOut(BaseModel):
@@ -58,16 +61,23 @@ class AnimeOut(BaseModel):
     coverImage: Optional[CoverImage] = None
 
 
+# Mongo projection for every read path that returns AnimeOut, so large
+# fields such as the embedding never leave the database.
+ANIME_OUT_FIELDS = tuple(AnimeOut.model_fields)
+ANIME_OUT_PROJECTION = {"_id": 0, **{field: 1 for field in ANIME_OUT_FIELDS}}
+
+
 class AnimeResponse(BaseModel):
     anime: Optional[AnimeOut]
 
 
 class AnimesListResponse(BaseModel):
     results: List[AnimeOut]
-    total: int
+    total: Optional[int]
     page: int
     perPage: int
-    totalPages: int
+    totalPages: Optional[int]
+    nextCursor: Optional[str] = None
 
 
 class AnimeListResponse(BaseModel):
@@ -88,6 +98,23 @@ class QueryMode(str, Enum):
     description = "description"
 
 
+class PaginationMode(str, Enum):
+    offset = "offset"
+    cursor = "cursor"
+
+
+class TotalMode(str, Enum):
+    exact = "exact"
+    estimated = "estimated"
+    none = "none"
+
+
+class AnimeSort(str, Enum):
+    inserted = "inserted"
+    averageScore = "averageScore"
+    seasonYear = "seasonYear"
+
+
 class ModelID(str, Enum):
     MISTRAL = "mistralai/devstral-2512:free"
     GPT_OSS = "openai/gpt-oss-20b:free"
@@ -104,7 +131,34 @@ AVAILABLE_MODELS = [
 class ChatBotRequest(BaseModel):
     message: str
     model_id: ModelID = ModelID.MISTRAL
+    session_id: Optional[str] = None
 
 
 class ChatBotResponse(BaseModel):
     results: str
+    session_id: Optional[str] = None
+
+
+class RecommendationQuery(BaseModel):
+    query: str
+    mode: QueryMode = QueryMode.description
+    top_k: int = Field(5, ge=1, le=50)
+    genre: Optional[str] = None
+    min_score: Optional[int] = None
+    max_score: Optional[int] = None
+    season: Optional[str] = None
+    year: Optional[int] = None
+
+
+class BatchRecommendationRequest(BaseModel):
+    queries: List[RecommendationQuery] = Field(min_length=1, max_length=50)
+    exclude_watchlist: bool = False
+
+
+class RecommendationResult(BaseModel):
+    results: List[AnimeOut]
+    error: Optional[str] = None
+
+
+class BatchRecommendationResponse(BaseModel):
+    results: List[RecommendationResult]
@@ -1,10 +1,15 @@
 from datetime import datetime
+from enum import Enum
 from os import wait
 from typing import List, Optional
 
 from app.schemas.animes import AnimeOut, AnimeStatus
 from pydantic import BaseModel, Field
 
+# Watchlist entries hold AniList ids as strings. They are also used as
+# field names in user_taste, so anything but plain digits is rejected.
+ANIME_ID_PATTERN = r"^[0-9]+$"
+
 
 class WatchlistItem(BaseModel):
     anime_id: str
@@ -30,3 +35,8 @@ class WatchlistAnimeOut(AnimeOut):
 class WatchlistAnimeResponseItem(AnimeOut):
     user_anime_status: Optional[AnimeStatus] = None
     watched_at: datetime
+
+
+class WatchlistSort(str, Enum):
+    newest = "newest"
+    oldest = "oldest"
@@ -1,92 +1,89 @@
-import asyncio
+from typing import List, Optional
 
 import httpx
 from app.dependencies import get_database
 from app.schemas.animes import Anime
 from app.utils.clean_text import clean_html
-from app.utils.embeddings import generate_embeddings
+from app.utils.embedding_codec import embedding_fields
+from app.utils.embeddings import generate_embeddings, generate_embeddings_batch
+from app.utils.metrics import anilist_errors
+from app.utils.neighbors import changed_embeddings, update_neighbors
+from app.utils.response_cache import catalog_version
+from app.utils.title_search import title_index
+from app.utils.vector_search import vector_index
 from fastapi import Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import ValidationError
+from pymongo import UpdateOne
 
 url = "https://graphql.anilist.co"
 
 
-async def get_anime(
-    page: int = 1, perPage: int = 1, db: AsyncIOMotorDatabase = Depends(get_database)
-):
-    anime_collection = db.animes
-    query = """
-    query ($page: Int, $perPage: Int) {
-      Page(page: $page, perPage: $perPage) {
-        media(type: ANIME, sort: POPULARITY_DESC) {
-          id
-          title {
-            romaji
-            english
-          }
-          description
-          genres
-          averageScore
-          episodes
-          duration
-          season
-          seasonYear
-          status
-          source
-          studios {
-            nodes {
-              name
-            }
-          }
-          coverImage {
-            large
-          }
+ANIME_PAGE_QUERY = """
+query ($page: Int, $perPage: Int) {
+  Page(page: $page, perPage: $perPage) {
+    pageInfo {
+      hasNextPage
+    }
+    media(type: ANIME, sort: POPULARITY_DESC) {
+      id
+      title {
+        romaji
+        english
+      }
+      synonyms
+      description
+      genres
+      averageScore
+      episodes
+      duration
+      season
+      seasonYear
+      status
+      source
+      studios {
+        nodes {
+          name
         }
       }
+      coverImage {
+        large
+      }
     }
-    """
+  }
+}
+"""
+
+
+async def get_anime(
+    page: int = 1,
+    perPage: int = 1,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    client: Optional[httpx.AsyncClient] = None,
+):
     variables = {"page": page, "perPage": perPage}
 
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        if client is None:
+            async with httpx.AsyncClient(timeout=60.0) as own_client:
+                response = await own_client.post(
+                    url, json={"query": ANIME_PAGE_QUERY, "variables": variables}
+                )
+        else:
             response = await client.post(
-                url, json={"query": query, "variables": variables}
+                url, json={"query": ANIME_PAGE_QUERY, "variables": variables}
             )
 
         if response.status_code == 200:
             data = response.json()
             animes = data["data"]["Page"]["media"]
+            documents = await build_anime_documents(animes)
+            stored = await store_animes(db, documents)
 
-            tasks = [process_anime(anime) for anime in animes]
-            processed_anime = await asyncio.gather(*tasks)
-
-            validated_anime = []
-
-            for anime in processed_anime:
-                anime["title"]["display_romaji"] = anime["title"]["romaji"]
-                anime["title"]["display_english"] = anime["title"]["english"]
-
-                anime["title"]["romaji"] = (
-                    anime["title"]["romaji"].lower()
-                    if anime["title"]["romaji"]
-                    else None
-                )
-                anime["title"]["english"] = (
-                    anime["title"]["english"].lower()
-                    if anime["title"]["english"]
-                    else None
-                )
-
-                if "description" in anime and anime["description"]:
-                    anime["description"] = clean_html(anime["description"])
-
-                validated_anime.append(Anime(**anime).model_dump())
-
-            await anime_collection.insert_many(validated_anime)
-
-            return {"status": "success", "inserted_ids": len(validated_anime)}
+            return {"status": "success", "inserted_ids": stored}
 
         else:
+            anilist_errors.inc(kind=f"http_{response.status_code}")
             return {
                 "status": "error",
                 "code": response.status_code,
@@ -105,6 +102,7 @@ async def get_anime_by_name(name: str):
           romaji
           english
         }
+        synonyms
         description
         genres
         averageScore
@@ -166,10 +164,11 @@ async def get_anime_by_name(name: str):
         return None
 
 
-async def process_anime(anime):
+def prepare_anime(anime: dict) -> str:
+    """Normalize a raw AniList media dict in place and return its embedding text."""
     title_romaji: str = anime["title"].get("romaji", "")
     title_english = anime["title"].get("english", "")
-    description_text = clean_html(anime.get("description", ""))
+    description_text = clean_html(anime.get("description") or "")
     genres = anime.get("genres", [])
     genres_text = ", ".join(genres)
 
@@ -190,8 +189,75 @@ async def process_anime(anime):
     else:
         anime["studios"] = []
 
-    final_text = f"Title: {title_romaji} ({title_english})\nDescription: {description_text}\nGenres: {genres_text}"
+    return f"Title: {title_romaji} ({title_english})\nDescription: {description_text}\nGenres: {genres_text}"
+
+
+async def process_anime(anime):
+    final_text = prepare_anime(anime)
 
     embedding = await generate_embeddings(final_text)
     anime["embedding"] = embedding if embedding else []
     return anime
+
+
+def to_anime_document(anime: dict) -> dict:
+    anime["title"]["display_romaji"] = anime["title"]["romaji"]
+    anime["title"]["display_english"] = anime["title"]["english"]
+
+    anime["title"]["romaji"] = (
+        anime["title"]["romaji"].lower() if anime["title"]["romaji"] else None
+    )
+    anime["title"]["english"] = (
+        anime["title"]["english"].lower() if anime["title"]["english"] else None
+    )
+
+    if "description" in anime and anime["description"]:
+        anime["description"] = clean_html(anime["description"])
+
+    document = Anime(**anime).model_dump()
+    document.update(embedding_fields(document["embedding"]))
+    return document
+
+
+async def build_anime_documents(animes: List[dict]) -> List[dict]:
+    """Normalize and embed a page of AniList media with one batched embed call."""
+    texts = [prepare_anime(anime) for anime in animes]
+    embeddings = await generate_embeddings_batch(texts)
+
+    documents = []
+    for anime, embedding in zip(animes, embeddings):
+        anime["embedding"] = embedding if embedding else []
+        try:
+            documents.append(to_anime_document(anime))
+        except ValidationError as e:
+            print(f"Skipping anime {anime.get('id')}:", e)
+    return documents
+
+
+async def store_animes(db: AsyncIOMotorDatabase, documents: List[dict]) -> int:
+    """Upsert anime keyed on ``id`` so re-running ingestion never duplicates."""
+    if not documents:
+        return 0
+
+    operations = [
+        UpdateOne({"id": document["id"]}, {"$set": document}, upsert=True)
+        for document in documents
+    ]
+    changed = await changed_embeddings(db, documents)
+    result = await db.animes.bulk_write(operations, ordered=False)
+
+    vector_index.add(documents)
+    title_index.add(documents)
+    if result.upserted_count or result.modified_count:
+        # Stamped with server time after the write, and before the bump
+        # that tells API processes to re-read the page (see catalog_sync).
+        await db.animes.update_many(
+            {"id": {"$in": [document["id"] for document in documents]}},
+            {"$currentDate": {"updated_at": True}},
+        )
+        await catalog_version.bump(db)
+    try:
+        await update_neighbors(db, changed)
+    except Exception as e:
+        print("Error updating anime neighbors:", e)
+    return result.upserted_count + result.modified_count
@@ -0,0 +1,45 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class AnimeFilter:
+    """Metadata filters shared by listings, recommendations and vector search."""
+
+    genre: Optional[str] = None
+    min_score: Optional[int] = None
+    max_score: Optional[int] = None
+    season: Optional[str] = None
+    year: Optional[int] = None
+    exclude_ids: List[int] = field(default_factory=list)
+
+    def __post_init__(self):
+        if self.season:
+            self.season = self.season.upper()
+
+    def is_empty(self) -> bool:
+        return not self.to_mongo()
+
+    def to_mongo(self) -> dict:
+        mongo_query = {}
+
+        if self.genre:
+            mongo_query["genres"] = self.genre
+
+        if self.min_score or self.max_score:
+            mongo_query["averageScore"] = {}
+            if self.min_score:
+                mongo_query["averageScore"]["$gte"] = self.min_score
+            if self.max_score:
+                mongo_query["averageScore"]["$lte"] = self.max_score
+
+        if self.season:
+            mongo_query["season"] = self.season
+
+        if self.year:
+            mongo_query["seasonYear"] = self.year
+
+        if self.exclude_ids:
+            mongo_query["id"] = {"$nin": list(self.exclude_ids)}
+
+        return mongo_query
@@ -0,0 +1,55 @@
+from typing import AsyncIterable, List, Optional
+
+from app.schemas.animes import ANIME_OUT_FIELDS, ANIME_OUT_PROJECTION
+from app.utils.metrics import timed
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+
+def to_anime_out(anime: dict) -> dict:
+    return {field: anime.get(field) for field in ANIME_OUT_FIELDS}
+
+
+async def collect_anime_out(cursor: AsyncIterable[dict]) -> List[dict]:
+    with timed("mongo_find"):
+        return [to_anime_out(anime) async for anime in cursor]
+
+
+async def find_anime_out_by_ids(
+    anime_collection: AsyncIOMotorCollection,
+    ids: List[int],
+    mongo_filter: Optional[dict] = None,
+    limit: Optional[int] = None,
+) -> List[dict]:
+    """Fetch anime by ``id`` and return them in the order of ``ids``.
+
+    ``mongo_filter`` drops ids whose anime does not match it; ``limit``
+    caps the result after ordering.
+    """
+    if not ids:
+        return []
+    query = {"id": {"$in": ids}}
+    if mongo_filter:
+        query = {"$and": [query, mongo_filter]}
+    with timed("mongo_find"):
+        cursor = anime_collection.find(query, ANIME_OUT_PROJECTION)
+        animes = {anime["id"]: anime async for anime in cursor}
+    return [to_anime_out(animes[i]) for i in ids if i in animes][:limit]
+
+
+async def sample_anime_out(
+    anime_collection: AsyncIOMotorCollection, mongo_filter: dict, count: int
+) -> List[dict]:
+    """Up to ``count`` distinct random anime matching ``mongo_filter``.
+
+    ``$sample`` can return a document twice, so a few extra are drawn and
+    duplicates dropped.
+    """
+    pipeline = [{"$sample": {"size": count * 2}}, {"$project": ANIME_OUT_PROJECTION}]
+    if mongo_filter:
+        pipeline.insert(0, {"$match": mongo_filter})
+    animes = {}
+    async for anime in anime_collection.aggregate(pipeline):
+        animes.setdefault(anime["id"], anime)
+        if len(animes) == count:
+            break
+    return [to_anime_out(anime) for anime in animes.values()]
@@ -1,8 +1,15 @@
+import asyncio
+import base64
+import hashlib
 import json
 import os
-from urllib.request import urlopen
+import time
+from pathlib import Path
+from typing import Optional
 
-from authlib.jose import JsonWebKey, jwt
+import httpx
+from app.utils.lru import LRUCache
+from authlib.jose import JsonWebKey, KeySet, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
@@ -10,30 +17,141 @@ AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
 API_AUDIENCE = os.getenv("AUTH0_API_AUDIENCE")
 ISSUER = f"https://{AUTH0_DOMAIN}/"
 JWKS_URL = f"{ISSUER}.well-known/jwks.json"
+# Read the key set from this file instead of Auth0, e.g. for offline tests.
+JWKS_FILE = os.getenv("AUTH0_JWKS_FILE")
+JWKS_REFRESH_SECONDS = float(os.getenv("AUTH0_JWKS_REFRESH_SECONDS", "3600"))
+# An unknown kid triggers at most one re-fetch per this many seconds.
+JWKS_MIN_REFETCH_SECONDS = float(os.getenv("AUTH0_JWKS_MIN_REFETCH_SECONDS", "60"))
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH0_TOKEN_CACHE_SIZE", "1024"))
 
-jwks = json.loads(urlopen(JWKS_URL).read())
-public_keys = JsonWebKey.import_key_set(jwks)
+
+class JWKSManager:
+    """Auth0 signing keys, fetched lazily and refreshed in the background.
+
+    Tokens signed with a key id that is not in the cached set cause an
+    immediate re-fetch (rate limited), which picks up key rotations.
+    """
+
+    def __init__(
+        self,
+        url: str = JWKS_URL,
+        jwks_file: Optional[str] = JWKS_FILE,
+        refresh_seconds: float = JWKS_REFRESH_SECONDS,
+        min_refetch_seconds: float = JWKS_MIN_REFETCH_SECONDS,
+    ):
+        self.url = url
+        self.jwks_file = jwks_file
+        self.refresh_seconds = refresh_seconds
+        self.min_refetch_seconds = min_refetch_seconds
+        self.fetches = 0
+        self._key_set: Optional[KeySet] = None
+        self._kids: set = set()
+        self._fetched_at = float("-inf")
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _fetch(self) -> dict:
+        if self.jwks_file:
+            return json.loads(Path(self.jwks_file).read_text())
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+            return response.json()
+
+    async def refresh(self):
+        jwks = await self._fetch()
+        self._key_set = JsonWebKey.import_key_set(jwks)
+        self._kids = {key.get("kid") for key in jwks.get("keys", [])}
+        self._fetched_at = time.monotonic()
+        self.fetches += 1
+
+    def _stale(self, kid: Optional[str]) -> bool:
+        if self._key_set is None:
+            return True
+        recently = time.monotonic() - self._fetched_at < self.min_refetch_seconds
+        return kid not in self._kids and not recently
+
+    async def key_set(self, kid: Optional[str] = None) -> KeySet:
+        if self._stale(kid):
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if self._stale(kid):
+                    await self.refresh()
+        return self._key_set
+
+    async def _refresh_forever(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print("Error refreshing Auth0 JWKS:", e)
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+jwks_manager = JWKSManager()
+# Verified claims keyed by token hash; each entry expires with its token.
+token_cache = LRUCache(TOKEN_CACHE_SIZE)
 
 bearer_scheme = HTTPBearer()
+optional_bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def _token_kid(token: str) -> Optional[str]:
+    header = token.split(".", 1)[0]
+    header += "=" * (-len(header) % 4)
+    return json.loads(base64.urlsafe_b64decode(header)).get("kid")
+
 
+async def verify_token(token: str) -> dict:
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    claims = token_cache.get(cache_key)
+    if claims is not None:
+        return claims
+
+    key_set = await jwks_manager.key_set(_token_kid(token))
+    claims = jwt.decode(token, key_set)
+    claims.validate()
+    aud = claims.get("aud")
+    if isinstance(aud, list):
+        if API_AUDIENCE not in aud:
+            raise ValueError("Invalid audience")
+    elif aud != API_AUDIENCE:
+        raise ValueError("Invalid audience")
+
+    claims = dict(claims)
+    ttl = claims.get("exp", 0) - time.time()
+    if ttl > 0:
+        token_cache.set(cache_key, claims, ttl_seconds=ttl)
+    return claims
 
-def get_current_user(
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
 ):
     token = credentials.credentials
     try:
-        claims = jwt.decode(token, public_keys)
-        claims.validate()
-        aud = claims.get("aud")
-        if isinstance(aud, list):
-            if API_AUDIENCE not in aud:
-                raise ValueError("Invalid audience")
-        elif aud != API_AUDIENCE:
-            raise ValueError("Invalid audience")
-
-        # print("✅ TOKEN CLAIMS:", claims)
-        return claims
+        return await verify_token(token)
 
+    except (httpx.HTTPError, OSError) as e:
+        print("Error loading Auth0 JWKS:", e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication keys unavailable",
+        )
     except Exception as e:
         # print("❌ TOKEN VALIDATION FAILED:", str(e))
         raise HTTPException(
@@ -43,10 +161,28 @@ def get_current_user(
         )
 
 
-def get_current_user_id(
+async def get_current_user_id(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
 ):
-    claims = get_current_user(credentials)
+    claims = await get_current_user(credentials)
     user_id = claims.get("sub")
     # print("✅ USER ID:", user_id)
     return user_id
+
+
+async def get_optional_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(
+        optional_bearer_scheme
+    ),
+):
+    """The caller's user id, or None if anonymous or the token does not verify.
+
+    Public endpoints must not fail on a stale or junk token; endpoints that
+    need the identity reject None themselves.
+    """
+    if credentials is None:
+        return None
+    try:
+        return await get_current_user_id(credentials)
+    except HTTPException:
+        return None
@@ -0,0 +1,99 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Optional
+
+from app.dependencies import get_db
+from app.utils.response_cache import catalog_version
+from app.utils.title_search import title_index
+from app.utils.vector_search import vector_index
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+CATALOG_SYNC_SECONDS = float(os.getenv("CATALOG_SYNC_SECONDS", "5"))
+
+
+class CatalogSync:
+    """Keeps this process's in-memory indexes in step with the animes collection.
+
+    Ingestion usually runs in ``fetch_anime.py``, whose index updates only
+    reach that process. store_animes stamps each written page with
+    ``updated_at`` and then bumps the catalog version; whenever this process
+    reads a new version, every anime updated since the last sync is re-read
+    into the vector and title indexes before the version is used. A
+    background task re-reads the version so idle workers catch up too.
+    """
+
+    def __init__(self, interval_seconds: float = CATALOG_SYNC_SECONDS):
+        self.interval_seconds = interval_seconds
+        self.version: Optional[int] = None
+        self.synced_since: Optional[datetime] = None
+        self.synced_animes = 0
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def _latest_update(db: AsyncIOMotorDatabase) -> Optional[datetime]:
+        doc = await db.animes.find_one(
+            {"updated_at": {"$exists": True}},
+            {"_id": 0, "updated_at": 1},
+            sort=[("updated_at", -1)],
+        )
+        return doc["updated_at"] if doc else None
+
+    async def mark(self, db: AsyncIOMotorDatabase):
+        """Record the catalog state a full load is about to read.
+
+        Call it before loading the indexes: anything written during the load
+        bumps the version afterwards and is re-read by the next sync.
+        """
+        self.version = await catalog_version.refresh(db)
+        self.synced_since = await self._latest_update(db)
+
+    async def sync(self, db: AsyncIOMotorDatabase, version: int) -> int:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if version == self.version:
+                return 0
+
+            latest = await self._latest_update(db)
+            # $gte re-reads the last page seen, which is harmless: adding an
+            # anime that is already indexed replaces it.
+            if self.synced_since is None:
+                query = {"updated_at": {"$exists": True}}
+            else:
+                query = {"updated_at": {"$gte": self.synced_since}}
+            await vector_index.refresh(db, query)
+            synced = await title_index.refresh(db, query)
+
+            self.version = version
+            self.synced_since = latest or self.synced_since
+            self.synced_animes += synced
+            return synced
+
+    async def _sync_forever(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                db = get_db()
+                # Also retries a sync that failed when the version changed.
+                await self.sync(db, await catalog_version.refresh(db))
+            except Exception as e:
+                print("Error syncing catalog indexes:", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+catalog_sync = CatalogSync()
+catalog_version.on_change(catalog_sync.sync)
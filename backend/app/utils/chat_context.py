@@ -0,0 +1,182 @@
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import List
+
+# Anime retrieved per chat turn before the budget trims them.
+CHAT_CANDIDATES = int(os.getenv("CHAT_CANDIDATES", "15"))
+# Always keep this many candidates, however far their scores fall behind.
+CHAT_MIN_CANDIDATES = int(os.getenv("CHAT_MIN_CANDIDATES", "3"))
+# Drop candidates scoring this far below the best match (scores are in
+# [0, 1], so 0.05 is a cosine gap of 0.1).
+CHAT_SCORE_MARGIN = float(os.getenv("CHAT_SCORE_MARGIN", "0.05"))
+# Below this many description tokens per candidate, the weakest candidate
+# is dropped instead of truncating every description further.
+CHAT_MIN_DESCRIPTION_TOKENS = int(os.getenv("CHAT_MIN_DESCRIPTION_TOKENS", "40"))
+# Share of the budget prior turns may use, and the cap per replayed message.
+CHAT_HISTORY_SHARE = float(os.getenv("CHAT_HISTORY_SHARE", "0.25"))
+CHAT_HISTORY_MESSAGE_TOKENS = int(os.getenv("CHAT_HISTORY_MESSAGE_TOKENS", "150"))
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate BPE token count without a model-specific tokenizer.
+
+    Words count one token per four characters and punctuation one each,
+    which lands slightly above what GPT-style tokenizers report for
+    English, so budgets err on the small side.
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep whole leading sentences of ``text`` that fit in ``max_tokens``.
+
+    If not even the first sentence fits, it is cut word by word.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    kept, used = [], 0
+    for sentence in _SENTENCE_END.split(text):
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    if kept:
+        return " ".join(kept)
+
+    words, used = [], 1  # the ellipsis
+    for word in text.split():
+        tokens = count_tokens(word)
+        if used + tokens > max_tokens:
+            break
+        words.append(word)
+        used += tokens
+    return " ".join(words) + "…"
+
+
+def format_anime(anime: dict, description: str) -> str:
+    title = anime.get("title") or {}
+    genres = ", ".join(anime.get("genres") or [])
+    return (
+        f"--- ANIME SUGGESTION ---\n"
+        f"Title: {title.get('romaji', 'N/A')} ({title.get('english', 'N/A')})\n"
+        f"Description: {description}\n"
+        f"Genre: {genres}\n"
+        f"Episodes: {anime.get('episodes', 'N/A')}\n"
+        f"Relevance Score: {anime.get('score', 'N/A')}"
+    )
+
+
+def select_candidates(animes: List[dict], min_candidates: int, margin: float):
+    """Drop candidates scoring more than ``margin`` below the best one."""
+    if not animes or "score" not in animes[0]:
+        return animes
+    best = max(anime.get("score", 0) for anime in animes)
+    return [
+        anime
+        for i, anime in enumerate(animes)
+        if i < min_candidates or anime.get("score", 0) >= best - margin
+    ]
+
+
+def compact_history(history: List[dict], budget: int, per_message: int):
+    """The most recent messages fitting ``budget``, oldest first.
+
+    Each message is shortened to ``per_message`` tokens first.
+    """
+    kept, used = [], 0
+    for message in reversed(history):
+        content = truncate_to_tokens(message["content"], per_message)
+        tokens = count_tokens(content)
+        if used + tokens > budget:
+            break
+        kept.append({**message, "content": content})
+        used += tokens
+    return kept[::-1]
+
+
+def fair_shares(sizes: List[int], total: int) -> List[int]:
+    """Split ``total`` so short items keep everything and long ones share the rest."""
+    shares = [0] * len(sizes)
+    left = len(sizes)
+    for i in sorted(range(len(sizes)), key=sizes.__getitem__):
+        shares[i] = min(sizes[i], total // left)
+        total -= shares[i]
+        left -= 1
+    return shares
+
+
+@dataclass
+class ChatContext:
+    messages: List[dict]
+    animes: List[dict]
+    prompt_tokens: int
+    budget: int
+    history_messages: int
+    dropped_animes: int = 0
+    truncated_descriptions: int = 0
+
+
+def build_context(
+    instructions: str,
+    history: List[dict],
+    message: str,
+    animes: List[dict],
+    budget: int,
+) -> ChatContext:
+    """Assemble the chat prompt within ``budget`` tokens.
+
+    The instructions and the user's request are always sent. Prior turns
+    get up to ``CHAT_HISTORY_SHARE`` of the budget, newest first. The rest
+    is split between the retrieved anime: weak matches are dropped, the
+    weakest remaining anime are dropped while the average share is too
+    small, and descriptions longer than their share are cut to whole
+    sentences.
+    """
+    request = f"The user's current request is: **{message}**\n\n"
+    request += "--- CONTENT ANIME DATA ---\n\n"
+    fixed = count_tokens(instructions) + count_tokens(request)
+
+    history = compact_history(
+        history,
+        int(max(budget - fixed, 0) * CHAT_HISTORY_SHARE),
+        CHAT_HISTORY_MESSAGE_TOKENS,
+    )
+    available = budget - fixed - sum(count_tokens(m["content"]) for m in history)
+
+    selected = select_candidates(animes, CHAT_MIN_CANDIDATES, CHAT_SCORE_MARGIN)
+    descriptions = [(anime.get("description") or "").strip() for anime in selected]
+    overhead = 0
+    while selected:
+        overhead = sum(count_tokens(format_anime(a, "")) for a in selected)
+        per_anime = (available - overhead) // len(selected)
+        if per_anime >= CHAT_MIN_DESCRIPTION_TOKENS or len(selected) == 1:
+            break
+        selected, descriptions = selected[:-1], descriptions[:-1]
+
+    sizes = [count_tokens(description) for description in descriptions]
+    shares = fair_shares(sizes, max(available - overhead, 0))
+    blocks, truncated = [], 0
+    for anime, description, size, share in zip(selected, descriptions, sizes, shares):
+        if size > share:
+            description = truncate_to_tokens(description, share)
+            truncated += 1
+        blocks.append(format_anime(anime, description))
+
+    messages = [{"role": "user", "content": instructions}, *history]
+    messages.append({"role": "user", "content": request + "\n\n".join(blocks)})
+    return ChatContext(
+        messages=messages,
+        animes=selected,
+        prompt_tokens=sum(count_tokens(m["content"]) for m in messages),
+        budget=budget,
+        history_messages=len(history),
+        dropped_animes=len(animes) - len(selected),
+        truncated_descriptions=truncated,
+    )
@@ -1,135 +1,246 @@
 import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
 
-import numpy as np
 from app.dependencies import get_database
+from app.utils.chat_context import CHAT_CANDIDATES, build_context
+from app.utils.conversation_store import conversation_store
 from app.utils.embeddings import generate_embeddings
+from app.utils.llm import ChatBackend, create_chat_backend
+from app.utils.metrics import prompt_tokens, stage_seconds, timed
+from app.utils.semantic_cache import semantic_cache
+from app.utils.vector_search import vector_index
 from fastapi import Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from openai import OpenAI
 
-openrouter_client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.environ.get("OPENROUTER_API_KEY"),
-)
+chat_backend: ChatBackend = create_chat_backend()
+FALLBACK_REPLY = "I'm having trouble connecting to my brain right now!"
+# Appended to a streamed reply whose stream failed partway.
+INTERRUPTED_NOTE = " [reply interrupted]"
 
-CONVERSATION_HISTORY = []
 VALID_ROLES = {"user", "model"}
 BASE_RAG_INFO = "Suggest 1-3 animes based EXCLUSIVELY on the provided context data."
+# Prompt tokens (instructions, history and anime context) per request for
+# models without their own budget below.
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "3000"))
+
+
+@dataclass
+class ModelPrompt:
+    instructions: str
+    token_budget: int = CHAT_TOKEN_BUDGET
+
+
 MODEL_SPECIFIC_INSTRUCTIONS = {
-    "mistralai/devstral-2512:free": (
+    "mistralai/devstral-2512:free": ModelPrompt(
         f"{BASE_RAG_INFO} Focus on being fast, concise, and friendly. "
-        "Use bullet points for readability."
+        "Use bullet points for readability.",
+        token_budget=2000,
     ),
-    "openai/gpt-oss-20b:free": (
+    "openai/gpt-oss-20b:free": ModelPrompt(
         f"{BASE_RAG_INFO} Be creative and 'Otaku-like'. "
-        "Explain WHY these animes match the user's vibe using colorful language."
+        "Explain WHY these animes match the user's vibe using colorful language.",
+        token_budget=3000,
     ),
-    "meta-llama/llama-3.3-70b-instruct:free": (
+    "meta-llama/llama-3.3-70b-instruct:free": ModelPrompt(
         f"{BASE_RAG_INFO} Be highly analytical. Compare the genres and scores "
-        "of the suggestions to give a logical reason for each pick. no need to include"
+        "of the suggestions to give a logical reason for each pick. no need to include",
+        token_budget=4000,
     ),
 }
 
-DEFAULT_PROMPT = f"{BASE_RAG_INFO} Be a helpful anime assistant."
+DEFAULT_PROMPT = ModelPrompt(f"{BASE_RAG_INFO} Be a helpful anime assistant.")
 
 
-async def openrouter_chatbot(
-    message: str, model_id: str, db: AsyncIOMotorDatabase = Depends(get_database)
-):
-    anime_collection = db.animes
-    CONVERSATION_HISTORY.append({"role": "user", "message": message})
+class LatencyTracker:
+    """Keeps the most recent latency samples per model for percentile stats."""
 
-    message_embedding = await generate_embeddings(message)
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._samples: dict[str, deque] = {}
 
-    if isinstance(message_embedding, np.ndarray):
-        message_embedding = message_embedding.tolist()
-    pipeline = [
-        {
-            "$vectorSearch": {
-                "index": "embeddings_vector_index",
-                "path": "embedding",
-                "queryVector": message_embedding,
-                "numCandidates": 100,
-                "limit": 15,
+    def record(self, model_id: str, seconds: float):
+        samples = self._samples.setdefault(model_id, deque(maxlen=self.max_samples))
+        samples.append(seconds)
+
+    def stats(self) -> dict:
+        result = {}
+        for model_id, samples in self._samples.items():
+            ordered = sorted(samples)
+            result[model_id] = {
+                "count": len(ordered),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                "p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1),
             }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "id": 1,
-                "title": 1,
-                "description": 1,
-                "averageScore": 1,
-                "genres": 1,
-                "episodes": 1,
-                "duration": 1,
-                "season": 1,
-                "seasonYear": 1,
-                "status": 1,
-                "source": 1,
-                "studios": 1,
-                "coverImage": 1,
-                "score": {"$meta": "vectorSearchScore"},
+        return result
+
+
+class PromptSizeTracker:
+    """Recent prompt sizes per model and the completion time they cost."""
+
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._samples: dict[str, deque] = {}
+
+    def record(self, model_id: str, prompt_tokens: int, seconds: float):
+        samples = self._samples.setdefault(model_id, deque(maxlen=self.max_samples))
+        samples.append((prompt_tokens, seconds))
+
+    def stats(self) -> dict:
+        result = {}
+        for model_id, samples in self._samples.items():
+            tokens = sorted(prompt_tokens for prompt_tokens, _ in samples)
+            seconds = sum(elapsed for _, elapsed in samples)
+            result[model_id] = {
+                "count": len(tokens),
+                "p50_tokens": tokens[len(tokens) // 2],
+                "p95_tokens": tokens[int(len(tokens) * 0.95)],
+                "max_tokens": tokens[-1],
+                "ms_per_1k_tokens": (
+                    round(seconds * 1000 / sum(tokens) * 1000, 1)
+                    if sum(tokens)
+                    else 0.0
+                ),
             }
-        },
-    ]
+        return result
+
+
+time_to_first_token = LatencyTracker()
+completion_time = LatencyTracker()
+prompt_sizes = PromptSizeTracker()
+
+
+def chatbot_stats() -> dict:
+    return {
+        "timeToFirstToken": time_to_first_token.stats(),
+        "completionTime": completion_time.stats(),
+        "promptTokens": prompt_sizes.stats(),
+        "activeSessions": len(conversation_store),
+        "semanticCache": semantic_cache.stats(),
+    }
+
+
+def set_chat_backend(backend: ChatBackend):
+    global chat_backend
+    chat_backend = backend
 
-    cursor = anime_collection.aggregate(pipeline)
-    results = [doc async for doc in cursor]
 
-    formatted_animes = [format_anime_for_llm(anime) for anime in results]
+@dataclass
+class ChatTurn:
+    messages: List[dict]
+    message_embedding: Optional[List[float]]
+    context_ids: List[int]
+    # Replies are only cached for the first turn of a session, where the
+    # answer depends on nothing but the question and the retrieved anime.
+    cacheable: bool
+    prompt_tokens: int = 0
 
-    context_string = "\n\n".join(formatted_animes)
 
-    system_instruction = MODEL_SPECIFIC_INSTRUCTIONS.get(model_id, DEFAULT_PROMPT)
-    messages = [{"role": "user", "content": system_instruction}]
+async def build_chat_messages(
+    message: str, model_id: str, session_id: str, db: AsyncIOMotorDatabase
+) -> ChatTurn:
+    message_embedding = await generate_embeddings(message)
 
-    for msg in CONVERSATION_HISTORY[-10:]:
-        role = "assistant" if msg["role"] == "bot" else "user"
-        messages.append({"role": role, "content": msg["message"]})
+    results = await vector_index.search(db, message_embedding, CHAT_CANDIDATES)
 
-    current_query_and_content = (
-        f"The user's current request is: **{message}**\n\n"
-        f"--- CONTENT ANIME DATA ---\n\n{context_string}"
+    prompt = MODEL_SPECIFIC_INSTRUCTIONS.get(model_id, DEFAULT_PROMPT)
+    history = [
+        {
+            "role": "assistant" if msg["role"] == "bot" else "user",
+            "content": msg["message"],
+        }
+        for msg in conversation_store.history(session_id)
+    ]
+    context = build_context(
+        prompt.instructions, history, message, results, prompt.token_budget
+    )
+    prompt_tokens.observe(context.prompt_tokens, model=model_id)
+
+    return ChatTurn(
+        messages=context.messages,
+        message_embedding=message_embedding,
+        context_ids=[anime.get("id") for anime in context.animes],
+        cacheable=not history,
+        prompt_tokens=context.prompt_tokens,
     )
 
-    messages.append({"role": "user", "content": current_query_and_content})
 
-    try:
-        response = openrouter_client.chat.completions.create(
-            model=model_id,
-            messages=messages,  # type: ignore
-            extra_headers={
-                "HTTP-Referer": "http://localhost:3000",
-                "X-Title": "Anime Genie Showcase",
-            },
-        )
-        reply = response.choices[0].message.content
-    except Exception as e:
-        print(f"Error: {e}")
-        reply = "I'm having trouble connecting to my brain right now!"
+def _cached_reply(turn: ChatTurn, model_id: str) -> Optional[str]:
+    if not turn.cacheable:
+        return None
+    return semantic_cache.get(model_id, turn.message_embedding, turn.context_ids)
 
-    CONVERSATION_HISTORY.append({"role": "bot", "message": reply})
 
-    if len(CONVERSATION_HISTORY) > 50:
-        CONVERSATION_HISTORY.pop(0)
+def _remember(
+    turn: ChatTurn, model_id: str, session_id: str, message, reply, cached=False
+):
+    if turn.cacheable and not cached and reply != FALLBACK_REPLY:
+        semantic_cache.put(model_id, turn.message_embedding, turn.context_ids, reply)
+    conversation_store.append(session_id, "user", message)
+    conversation_store.append(session_id, "bot", reply)
+
 
+async def openrouter_chatbot(
+    message: str,
+    model_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    session_id: str = "default",
+):
+    turn = await build_chat_messages(message, model_id, session_id, db)
+
+    reply = _cached_reply(turn, model_id)
+    cached = reply is not None
+    if not cached:
+        started = time.perf_counter()
+        try:
+            with timed("llm"):
+                reply = await chat_backend.complete(model_id, turn.messages)
+            elapsed = time.perf_counter() - started
+            completion_time.record(model_id, elapsed)
+            prompt_sizes.record(model_id, turn.prompt_tokens, elapsed)
+        except Exception as e:
+            print(f"Error: {e}")
+            reply = FALLBACK_REPLY
+
+    _remember(turn, model_id, session_id, message, reply, cached)
     return reply
 
 
-def format_anime_for_llm(anime: dict) -> str:
-    title_romaji = anime.get("title", {}).get("romaji", "N/A")
-    title_english = anime.get("title", {}).get("english", "N/A")
-    description = anime.get("description", "No description provied").strip()
-    genres = ", ".join(anime.get("genres", []))
-    score = anime.get("averageScore", "N/A")
-    episodes = anime.get("episodes", "N/A")
-
-    return (
-        f"--- ANIME SUGGESTION ---\n"
-        f"Title: {title_romaji} ({title_english})\n"
-        f"Description: {description}\n"
-        f"Genre: {genres}\n"
-        f"Episodes: {episodes}\n"
-        f"Relevance Score: {anime.get("score", "N/A")}"
-    )
+async def stream_openrouter_chatbot(
+    message: str, model_id: str, db: AsyncIOMotorDatabase, session_id: str
+) -> AsyncIterator[str]:
+    """Yield the reply as it is generated, recording time to first token."""
+    turn = await build_chat_messages(message, model_id, session_id, db)
+
+    reply = _cached_reply(turn, model_id)
+    if reply is not None:
+        yield reply
+        _remember(turn, model_id, session_id, message, reply, cached=True)
+        return
+
+    started = time.perf_counter()
+    chunks = []
+    failed = False
+    try:
+        async for delta in chat_backend.stream(model_id, turn.messages):
+            if not chunks:
+                time_to_first_token.record(model_id, time.perf_counter() - started)
+            chunks.append(delta)
+            yield delta
+        elapsed = time.perf_counter() - started
+        completion_time.record(model_id, elapsed)
+        prompt_sizes.record(model_id, turn.prompt_tokens, elapsed)
+        stage_seconds.observe(elapsed, stage="llm")
+    except Exception as e:
+        print(f"Error: {e}")
+        failed = True
+        # A cut-off reply is marked as such, in the stream and the history.
+        ending = INTERRUPTED_NOTE if chunks else FALLBACK_REPLY
+        chunks.append(ending)
+        yield ending
+
+    # A failed reply is never cached for later questions.
+    _remember(turn, model_id, session_id, message, "".join(chunks), cached=failed)
@@ -0,0 +1,61 @@
+import os
+import time
+from collections import OrderedDict, deque
+from typing import List
+
+CHAT_HISTORY_LENGTH = int(os.getenv("CHAT_HISTORY_LENGTH", "10"))
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", "3600"))
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "10000"))
+
+
+class ConversationStore:
+    """Per-session chat history in bounded deques.
+
+    Sessions idle for longer than ``ttl_seconds`` are dropped, and the least
+    recently used sessions are evicted beyond ``max_sessions``.
+    """
+
+    def __init__(
+        self,
+        history_length: int = CHAT_HISTORY_LENGTH,
+        ttl_seconds: float = CHAT_SESSION_TTL_SECONDS,
+        max_sessions: int = CHAT_MAX_SESSIONS,
+    ):
+        self.history_length = history_length
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, tuple[float, deque]] = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self, now: float):
+        # Sessions are kept in access order, so expired ones sit at the front.
+        while self._sessions:
+            session_id, (last_seen, _) = next(iter(self._sessions.items()))
+            if now - last_seen <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def _touch(self, session_id: str) -> deque:
+        now = time.monotonic()
+        self._evict(now)
+        _, history = self._sessions.pop(
+            session_id, (now, deque(maxlen=self.history_length))
+        )
+        self._sessions[session_id] = (now, history)
+        return history
+
+    def history(self, session_id: str) -> List[dict]:
+        return list(self._touch(session_id))
+
+    def append(self, session_id: str, role: str, message: str):
+        self._touch(session_id).append({"role": role, "message": message})
+
+    def clear(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+
+conversation_store = ConversationStore()
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import re
+import unicodedata
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from app.dependencies import get_db
+from app.utils.embedding_codec import decode_embedding, encode_embedding
+from app.utils.lru import LRUCache
+from pymongo import UpdateOne
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+# "mongo" keeps a persistent copy in the embedding_cache collection, "none"
+# keeps the cache purely in memory.
+EMBEDDING_CACHE_PERSISTENT = os.getenv("EMBEDDING_CACHE_PERSISTENT", "mongo")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def cache_key(model: str, text: str) -> str:
+    payload = f"{model}\x00{normalize_text(text)}".encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier cache of embeddings keyed by hash(model, normalized text).
+
+    Lookups hit the in-memory LRU first and fall back to the
+    ``embedding_cache`` Mongo collection, promoting anything found there.
+    """
+
+    def __init__(
+        self,
+        max_size: int = EMBEDDING_CACHE_SIZE,
+        ttl_seconds: float = EMBEDDING_CACHE_TTL_SECONDS,
+        persistent: bool = EMBEDDING_CACHE_PERSISTENT == "mongo",
+    ):
+        self.memory = LRUCache(max_size, ttl_seconds)
+        self.persistent = persistent
+        self.persistent_hits = 0
+        self.persistent_misses = 0
+        self.persistent_errors = 0
+
+    def _collection(self):
+        return get_db().embedding_cache
+
+    async def get_many(
+        self, model: str, texts: List[str]
+    ) -> List[Optional[List[float]]]:
+        keys = [cache_key(model, text) for text in texts]
+        results: List[Optional[List[float]]] = []
+        missing: Dict[str, List[int]] = {}
+
+        for i, key in enumerate(keys):
+            vector = self.memory.get(key)
+            if vector is None:
+                missing.setdefault(key, []).append(i)
+                results.append(None)
+            else:
+                results.append(vector.tolist())
+
+        if missing and self.persistent:
+            try:
+                cursor = self._collection().find(
+                    {"_id": {"$in": list(missing)}}, {"embedding": 1}
+                )
+                async for doc in cursor:
+                    vector = decode_embedding(doc["embedding"])
+                    self.memory.set(doc["_id"], vector)
+                    for i in missing.pop(doc["_id"]):
+                        results[i] = vector.tolist()
+                        self.persistent_hits += 1
+                self.persistent_misses += sum(len(v) for v in missing.values())
+            except Exception as e:
+                self.persistent_errors += 1
+                print("Error reading embedding cache:", e)
+
+        return results
+
+    async def put_many(self, model: str, items: Dict[str, List[float]]):
+        documents = {}
+        for text, embedding in items.items():
+            key = cache_key(model, text)
+            self.memory.set(key, np.asarray(embedding, dtype=np.float32))
+            documents[key] = embedding
+
+        if not documents or not self.persistent:
+            return
+
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"_id": key},
+                {
+                    "$setOnInsert": {
+                        "model": model,
+                        "embedding": encode_embedding(embedding, "float32")[0],
+                        "created_at": now,
+                    }
+                },
+                upsert=True,
+            )
+            for key, embedding in documents.items()
+        ]
+        try:
+            await self._collection().bulk_write(operations, ordered=False)
+        except Exception as e:
+            self.persistent_errors += 1
+            print("Error writing embedding cache:", e)
+
+    def stats(self) -> dict:
+        return {
+            **self.memory.stats(),
+            "persistent": self.persistent,
+            "persistentHits": self.persistent_hits,
+            "persistentMisses": self.persistent_misses,
+            "persistentErrors": self.persistent_errors,
+        }
+
+
+embedding_cache = EmbeddingCache()
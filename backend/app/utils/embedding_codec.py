@@ -0,0 +1,77 @@
+import os
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+from bson.binary import Binary, BinaryVectorDtype
+
+# How embeddings are written to the animes collection: "float32" or "int8"
+# BSON binary vectors, or "list" for the legacy array of doubles.
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float32")
+
+# BSON binary vectors (subtype 9) start with a dtype byte and a padding byte.
+_HEADER_SIZE = 2
+_NUMPY_DTYPES = {
+    BinaryVectorDtype.FLOAT32.value[0]: np.dtype("<f4"),
+    BinaryVectorDtype.INT8.value[0]: np.dtype("i1"),
+}
+
+EmbeddingValue = Union[Binary, bytes, Sequence[float], np.ndarray, None]
+
+
+def quantize_int8(vector: np.ndarray) -> Tuple[np.ndarray, float]:
+    peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+    scale = peak / 127 if peak else 1.0
+    quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    return quantized, scale
+
+
+def encode_embedding(
+    vector: EmbeddingValue, storage: str = EMBEDDING_STORAGE
+) -> Tuple[Union[Binary, list, None], Optional[float]]:
+    """Encode a vector for storage, returning ``(value, scale)``.
+
+    ``scale`` is only set for int8 storage, where ``value * scale``
+    recovers the original vector.
+    """
+    if vector is None or len(vector) == 0:
+        return vector if vector is None else [], None
+    if isinstance(vector, Binary) and vector.subtype == 9:
+        return vector, None
+
+    array = np.asarray(vector, dtype=np.float32)
+    if storage == "list":
+        return array.tolist(), None
+    if storage == "int8":
+        quantized, scale = quantize_int8(array)
+        header = bytes([BinaryVectorDtype.INT8.value[0], 0])
+        return Binary(header + quantized.tobytes(), subtype=9), scale
+    if storage == "float32":
+        header = bytes([BinaryVectorDtype.FLOAT32.value[0], 0])
+        return Binary(header + array.astype("<f4").tobytes(), subtype=9), None
+    raise ValueError(f"Unknown embedding storage: {storage}")
+
+
+def decode_embedding(
+    value: EmbeddingValue, scale: Optional[float] = None
+) -> Optional[np.ndarray]:
+    """Decode a stored embedding into a NumPy vector.
+
+    float32 binaries are returned as a read-only view over the BSON
+    payload without copying; int8 binaries are rescaled to float32.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        dtype = _NUMPY_DTYPES.get(value[0])
+        if dtype is None:
+            raise ValueError(f"Unsupported vector dtype byte: {value[0]:#x}")
+        array = np.frombuffer(value, dtype=dtype, offset=_HEADER_SIZE)
+        if dtype.kind == "i":
+            return array.astype(np.float32) * np.float32(scale or 1.0)
+        return array
+    return np.asarray(value, dtype=np.float32)
+
+
+def embedding_fields(vector: EmbeddingValue, storage: str = EMBEDDING_STORAGE) -> dict:
+    value, scale = encode_embedding(vector, storage)
+    return {"embedding": value, "embedding_scale": scale}
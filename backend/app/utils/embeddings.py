@@ -1,22 +1,200 @@
+import asyncio
+import hashlib
+import os
+import re
+from abc import ABC, abstractmethod
 from typing import List, Optional
 
-from google import genai
+import numpy as np
+from app.utils.embedding_cache import embedding_cache
+from app.utils.metrics import embedding_failures, timed
 
-client = genai.Client()
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "gemini-embedding-001")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "gemini")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "3072"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "10"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
 
 
-async def generate_embeddings(text: str) -> Optional[List[float]]:
-    try:
-        response = client.models.embed_content(
-            model="gemini-embedding-001", contents=text
+class EmbeddingBackend(ABC):
+    model: str
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed every text in one call, keeping the order of ``texts``."""
+
+
+class GeminiEmbeddingBackend(EmbeddingBackend):
+    def __init__(self, model: str = EMBEDDING_MODEL):
+        self.model = model
+        self._client = None
+
+    @property
+    def client(self):
+        # Created on first use so importing this module never needs an API key.
+        if self._client is None:
+            from google import genai
+
+            self._client = genai.Client()
+        return self._client
+
+    async def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        response = await self.client.aio.models.embed_content(
+            model=self.model, contents=texts
         )
+        embeddings = response.embeddings or []
+        if len(embeddings) != len(texts):
+            print(
+                f"Expected {len(texts)} embeddings in response, got {len(embeddings)}."
+            )
+            return [None] * len(texts)
+        return [embedding.values for embedding in embeddings]
+
+
+class HashEmbeddingBackend(EmbeddingBackend):
+    """Deterministic, offline stand-in for tests and benchmarks.
+
+    Each token is hashed into a signed bucket, so texts sharing words end
+    up with a high cosine similarity just like a real embedding model.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, model: str = "local-hash"):
+        self.dim = dim
+        self.model = model
+
+    def embed_one(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dim] += sign
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    async def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        return [self.embed_one(text) for text in texts]
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embedding requests into multi-content calls.
+
+    Requests are queued until either ``max_batch_size`` texts are waiting
+    or ``max_wait_ms`` has passed since the first one arrived, then sent
+    to the backend as one batch. At most ``max_concurrency`` batches are
+    in flight at a time.
+    """
+
+    def __init__(
+        self,
+        backend: EmbeddingBackend,
+        max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+        max_wait_ms: float = EMBEDDING_MAX_WAIT_MS,
+        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+    ):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrency = max_concurrency
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _bind_loop(self, loop: asyncio.AbstractEventLoop):
+        if self._loop is not loop:
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        loop = asyncio.get_running_loop()
+        self._bind_loop(loop)
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size :]
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        assert self._semaphore is not None
+        try:
+            async with self._semaphore:
+                results = await self.backend.embed(texts)
+        except Exception as e:
+            print("Error generating embedding:", e)
+            results = [None] * len(batch)
+        embedding_failures.inc(sum(1 for result in results if result is None))
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def create_backend(name: str = EMBEDDING_BACKEND) -> EmbeddingBackend:
+    if name == "gemini":
+        return GeminiEmbeddingBackend()
+    if name == "hash":
+        return HashEmbeddingBackend()
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+batcher = EmbeddingBatcher(create_backend())
+
+
+def set_embedding_backend(backend: EmbeddingBackend):
+    global batcher
+    batcher = EmbeddingBatcher(
+        backend,
+        max_batch_size=batcher.max_batch_size,
+        max_wait_ms=batcher.max_wait * 1000,
+        max_concurrency=batcher.max_concurrency,
+    )
+
+
+async def generate_embeddings(text: str) -> Optional[List[float]]:
+    embedding = (await generate_embeddings_batch([text]))[0]
+    if embedding is None:
+        print("No embeddings found in response.")
+    return embedding
+
+
+async def generate_embeddings_batch(texts: List[str]) -> List[Optional[List[float]]]:
+    model = batcher.backend.model
+    results = await embedding_cache.get_many(model, texts)
+
+    missing = list(dict.fromkeys(t for t, r in zip(texts, results) if r is None))
+    if not missing:
+        return results
 
-        if response.embeddings is not None and len(response.embeddings) > 0:
-            embeddings = response.embeddings[0].values
-            return embeddings
-        else:
-            print("No embeddings found in response.")
-            return None
-    except Exception as e:
-        print("Error generating embedding:", e)
-        return None
+    with timed("embedding"):
+        fresh = dict(zip(missing, await batcher.embed_many(missing)))
+    await embedding_cache.put_many(
+        model, {text: vector for text, vector in fresh.items() if vector is not None}
+    )
+    return [r if r is not None else fresh[t] for t, r in zip(texts, results)]
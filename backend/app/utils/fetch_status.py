@@ -5,7 +5,7 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 
 async def get_current_page(db: AsyncIOMotorDatabase = Depends(get_database)):
     status_collection = db.status
-    doc = await status_collection.find_one({})
+    doc = await status_collection.find_one({"_id": "anime_fetch_status"})
     if doc:
         return doc.get("current_page", 1)
     else:
@@ -0,0 +1,165 @@
+from typing import Dict, List, Optional
+
+from app.utils.embedding_cache import EMBEDDING_CACHE_TTL_SECONDS
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Every index the application relies on, per collection. ensure_indexes
+# creates anything missing at startup; existing indexes are left alone.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "animes": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("title.romaji", ASCENDING)], name="title_romaji"),
+        IndexModel([("title.english", ASCENDING)], name="title_english"),
+        IndexModel(
+            [("genres", ASCENDING), ("averageScore", DESCENDING)], name="genres_score"
+        ),
+        IndexModel(
+            [("season", ASCENDING), ("seasonYear", ASCENDING)], name="season_year"
+        ),
+        IndexModel(
+            [("averageScore", DESCENDING), ("_id", ASCENDING)], name="score_desc"
+        ),
+        IndexModel(
+            [("seasonYear", DESCENDING), ("_id", ASCENDING)], name="season_year_desc"
+        ),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "watchlist": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "anime_neighbors": [
+        IndexModel([("neighbors.id", ASCENDING)], name="neighbor_ids"),
+    ],
+    "embedding_cache": [
+        IndexModel(
+            [("created_at", ASCENDING)],
+            name="created_at_ttl",
+            expireAfterSeconds=int(EMBEDDING_CACHE_TTL_SECONDS),
+        ),
+    ],
+}
+
+# Queries served on hot paths; each must be answered from an index.
+HOT_QUERIES = [
+    ("animes", {"id": 1}, None),
+    ("animes", {"id": {"$in": [1, 2, 3]}}, None),
+    ("animes", {"$or": [{"title.romaji": "x"}, {"title.english": "x"}]}, None),
+    ("animes", {"genres": "Action"}, None),
+    ("animes", {"season": "WINTER", "seasonYear": 2024}, None),
+    ("animes", {}, [("averageScore", DESCENDING), ("_id", ASCENDING)]),
+    ("watchlist", {"user_id": "auth0|user"}, None),
+    ("anime_neighbors", {"_id": 1}, None),
+    ("anime_neighbors", {"neighbors.id": {"$in": [1, 2, 3]}}, None),
+    ("user_taste", {"_id": "auth0|user"}, None),
+]
+
+
+def unique_key(index: IndexModel) -> Optional[str]:
+    spec = index.document
+    if spec.get("unique") and len(spec["key"]) == 1:
+        return next(iter(spec["key"]))
+    return None
+
+
+async def find_duplicates(
+    collection: AsyncIOMotorCollection, key: str, limit: int = 0
+) -> List[dict]:
+    """Groups of documents sharing ``key``, each with its ``_id``s oldest first."""
+    pipeline = [
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": f"${key}", "ids": {"$push": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ]
+    if limit:
+        pipeline.append({"$limit": limit})
+    return await collection.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+
+async def remove_duplicates(collection: AsyncIOMotorCollection, key: str) -> int:
+    """Keep the oldest document per ``key`` value and delete the rest.
+
+    The oldest is the one unsorted reads have been returning.
+    """
+    removed = 0
+    for group in await find_duplicates(collection, key):
+        result = await collection.delete_many({"_id": {"$in": group["ids"][1:]}})
+        removed += result.deleted_count
+    return removed
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> Dict[str, List[str]]:
+    """Create missing indexes one at a time, so one failure blocks no others."""
+    created = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        created[collection_name] = []
+        try:
+            existing = set(await collection.index_information())
+        except Exception as e:
+            print(f"Error listing indexes on {collection_name}:", e)
+            continue
+        for index in indexes:
+            name = index.document["name"]
+            if name in existing:
+                continue
+            try:
+                key = unique_key(index)
+                if key and await find_duplicates(collection, key, limit=1):
+                    print(
+                        f"Skipping index {collection_name}.{name}: duplicate "
+                        f"{key!r} values (run check_indexes.py --dedupe)"
+                    )
+                    continue
+                created[collection_name] += await collection.create_indexes([index])
+                print(f"Created index {collection_name}.{name}")
+            except Exception as e:
+                # Usually a definition conflicting with an existing index;
+                # the app still works, just without this one.
+                print(f"Error creating index {collection_name}.{name}:", e)
+    return created
+
+
+def _stages(plan: dict):
+    yield plan.get("stage")
+    if "inputStage" in plan:
+        yield from _stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+    if "queryPlan" in plan:
+        yield from _stages(plan["queryPlan"])
+
+
+def winning_plan_stages(explain: dict) -> List[str]:
+    planner = explain.get("queryPlanner", {})
+    return [stage for stage in _stages(planner.get("winningPlan", {})) if stage]
+
+
+async def explain_find(
+    collection: AsyncIOMotorCollection, query: dict, sort: Optional[list] = None
+) -> dict:
+    cursor = collection.find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    return await cursor.explain()
+
+
+async def assert_uses_index(
+    collection: AsyncIOMotorCollection, query: dict, sort: Optional[list] = None
+):
+    stages = winning_plan_stages(await explain_find(collection, query, sort))
+    if "COLLSCAN" in stages:
+        raise AssertionError(
+            f"{collection.name} query {query} sort {sort} falls back to COLLSCAN"
+        )
+
+
+async def check_hot_queries(db: AsyncIOMotorDatabase) -> List[str]:
+    """Return a description of every hot query whose plan is a COLLSCAN."""
+    failures = []
+    for collection_name, query, sort in HOT_QUERIES:
+        try:
+            await assert_uses_index(db[collection_name], query, sort)
+        except AssertionError as e:
+            failures.append(str(e))
+    return failures
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+from app.utils.anime_api import (
+    ANIME_PAGE_QUERY,
+    build_anime_documents,
+    store_animes,
+    url,
+)
+from app.utils.fetch_status import get_current_page, update_current_page
+from app.utils.metrics import anilist_errors
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+INGEST_PER_PAGE = int(os.getenv("INGEST_PER_PAGE", "50"))
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "3"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "5"))
+
+
+class AniListRateLimiter:
+    """Tracks AniList's X-RateLimit-* headers and pauses before the limit."""
+
+    def __init__(self):
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            if self.remaining is not None and self.remaining <= 1:
+                delay = self.reset_at - time.time()
+                if delay > 0:
+                    print(f"⏳ AniList rate limit reached, waiting {delay:.0f}s")
+                    await asyncio.sleep(delay)
+                self.remaining = None
+
+    def update(self, headers: httpx.Headers):
+        if "X-RateLimit-Remaining" in headers:
+            self.remaining = int(headers["X-RateLimit-Remaining"])
+        if "X-RateLimit-Reset" in headers:
+            self.reset_at = float(headers["X-RateLimit-Reset"])
+        elif "Retry-After" in headers:
+            self.reset_at = time.time() + float(headers["Retry-After"])
+
+
+class AniListPageFetcher:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        max_retries: int = INGEST_MAX_RETRIES,
+        record_dir: Optional[Path] = None,
+    ):
+        self.client = client
+        self.max_retries = max_retries
+        self.record_dir = record_dir
+        self.rate_limiter = AniListRateLimiter()
+
+    async def fetch_page(self, page: int, per_page: int) -> dict:
+        payload = {
+            "query": ANIME_PAGE_QUERY,
+            "variables": {"page": page, "perPage": per_page},
+        }
+
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.wait()
+            try:
+                response = await self.client.post(url, json=payload)
+            except httpx.TransportError as e:
+                anilist_errors.inc(kind="transport")
+                if attempt == self.max_retries:
+                    raise
+                print(f"⚠️ Page {page}: {e}, retrying")
+                await asyncio.sleep(2**attempt)
+                continue
+
+            self.rate_limiter.update(response.headers)
+            if response.status_code == 200:
+                data = response.json()
+                result = (data.get("data") or {}).get("Page")
+                if result is not None and not data.get("errors"):
+                    if self.record_dir is not None:
+                        fixture = self.record_dir / f"page_{page}.json"
+                        fixture.write_text(json.dumps(data))
+                    return result
+
+                # A GraphQL error payload: retried like a server error,
+                # before anything of the page is stored.
+                anilist_errors.inc(kind="graphql")
+                messages = "; ".join(
+                    str(error.get("message")) for error in data.get("errors") or []
+                )
+                problem = f"AniList errors: {messages}" if messages else "no Page data"
+                if attempt == self.max_retries:
+                    raise RuntimeError(f"Page {page}: {problem}")
+                print(f"⚠️ Page {page}: {problem}, retrying")
+                await asyncio.sleep(2**attempt)
+                continue
+
+            anilist_errors.inc(
+                kind=(
+                    "rate_limited"
+                    if response.status_code == 429
+                    else f"http_{response.status_code}"
+                )
+            )
+            if response.status_code == 429:
+                retry_after = float(response.headers.get("Retry-After", 60))
+                self.rate_limiter.remaining = 0
+                self.rate_limiter.reset_at = time.time() + retry_after
+            elif response.status_code < 500 or attempt == self.max_retries:
+                response.raise_for_status()
+            else:
+                await asyncio.sleep(2**attempt)
+
+        raise RuntimeError(f"Page {page}: AniList kept rate limiting the requests")
+
+
+def fixture_transport(fixtures_dir: Path) -> httpx.MockTransport:
+    """Serve recorded ``page_<n>.json`` AniList responses instead of the API.
+
+    Pages without a fixture come back empty, which ends the ingestion run.
+    """
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        variables = json.loads(request.content)["variables"]
+        fixture = fixtures_dir / f"page_{variables['page']}.json"
+        if fixture.exists():
+            return httpx.Response(200, content=fixture.read_bytes())
+        empty = {"data": {"Page": {"pageInfo": {"hasNextPage": False}, "media": []}}}
+        return httpx.Response(200, json=empty)
+
+    return httpx.MockTransport(handler)
+
+
+async def run_ingestion(
+    db: AsyncIOMotorDatabase,
+    per_page: int = INGEST_PER_PAGE,
+    concurrency: int = INGEST_CONCURRENCY,
+    max_pages: Optional[int] = None,
+    start_page: Optional[int] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+    record_dir: Optional[Path] = None,
+) -> dict:
+    """Fetch, embed and upsert AniList pages, resuming from the checkpoint.
+
+    ``concurrency`` pages are fetched at once while the previous window is
+    embedded and written. Pages are committed in order and the checkpoint in
+    ``fetch_status`` only advances past a page once it is stored, so a crash
+    resumes from the first page that was not committed.
+    """
+    page = start_page if start_page is not None else await get_current_page(db)
+    last_page = page + max_pages - 1 if max_pages else None
+    stats = {"startPage": page, "pages": 0, "animes": 0}
+    started = time.perf_counter()
+
+    async with httpx.AsyncClient(timeout=60.0, transport=transport) as client:
+        fetcher = AniListPageFetcher(client, record_dir=record_dir)
+
+        def fetch_window(first: int) -> asyncio.Task:
+            pages = [
+                p
+                for p in range(first, first + concurrency)
+                if last_page is None or p <= last_page
+            ]
+            return asyncio.ensure_future(
+                asyncio.gather(*(fetcher.fetch_page(p, per_page) for p in pages))
+            )
+
+        pending = fetch_window(page)
+        while True:
+            results: List[dict] = await pending
+            if not results:
+                break
+
+            has_next = all(r["pageInfo"]["hasNextPage"] for r in results)
+            next_first = page + len(results)
+            # Fetch the next window while this one is embedded and stored.
+            pending = fetch_window(next_first) if has_next else None
+
+            documents = await build_anime_documents(
+                [anime for result in results for anime in result["media"]]
+            )
+
+            for result in results:
+                if not result["media"]:
+                    # Past the end of the catalog; keep the checkpoint here.
+                    has_next = False
+                    break
+                ids = {anime["id"] for anime in result["media"]}
+                page_documents = [d for d in documents if d["id"] in ids]
+                stats["animes"] += await store_animes(db, page_documents)
+                stats["pages"] += 1
+                page += 1
+                await update_current_page(page, db)
+                print(f"✅ Page {page - 1}: {len(page_documents)} animes")
+
+            if not has_next:
+                if pending is not None:
+                    pending.cancel()
+                break
+
+    stats["nextPage"] = page
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
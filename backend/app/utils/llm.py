@@ -0,0 +1,93 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, List
+
+# "openrouter" talks to the real API, "fake" answers locally for tests and
+# benchmarks.
+CHAT_BACKEND = os.getenv("CHAT_BACKEND", "openrouter")
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+
+OPENROUTER_HEADERS = {
+    "HTTP-Referer": "http://localhost:3000",
+    "X-Title": "Anime Genie Showcase",
+}
+
+
+class ChatBackend(ABC):
+    @abstractmethod
+    async def complete(self, model_id: str, messages: List[dict]) -> str:
+        """Return the full reply for ``messages``."""
+
+    @abstractmethod
+    def stream(self, model_id: str, messages: List[dict]) -> AsyncIterator[str]:
+        """Yield the reply in chunks as it is generated."""
+
+
+class OpenRouterBackend(ChatBackend):
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(
+                base_url="https://openrouter.ai/api/v1",
+                api_key=os.environ.get("OPENROUTER_API_KEY"),
+            )
+        return self._client
+
+    async def complete(self, model_id, messages):
+        response = await self.client.chat.completions.create(
+            model=model_id,
+            messages=messages,  # type: ignore
+            extra_headers=OPENROUTER_HEADERS,
+        )
+        return response.choices[0].message.content
+
+    async def stream(self, model_id, messages):
+        stream = await self.client.chat.completions.create(
+            model=model_id,
+            messages=messages,  # type: ignore
+            extra_headers=OPENROUTER_HEADERS,
+            stream=True,
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+
+class FakeChatBackend(ChatBackend):
+    """Echoes a canned reply after a configurable delay, split into words."""
+
+    def __init__(self, latency_ms: float = FAKE_LLM_LATENCY_MS, chunks: int = 8):
+        self.latency = latency_ms / 1000
+        self.chunks = chunks
+        self.calls = 0
+
+    def _reply(self, model_id: str, messages: List[dict]) -> str:
+        request = messages[-1]["content"].splitlines()[0]
+        return f"[{model_id}] {request}"
+
+    async def complete(self, model_id, messages):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._reply(model_id, messages)
+
+    async def stream(self, model_id, messages):
+        self.calls += 1
+        words = self._reply(model_id, messages).split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.latency / len(words))
+            yield word if i == 0 else f" {word}"
+
+
+def create_chat_backend(name: str = CHAT_BACKEND) -> ChatBackend:
+    if name == "openrouter":
+        return OpenRouterBackend()
+    if name == "fake":
+        return FakeChatBackend()
+    raise ValueError(f"Unknown chat backend: {name}")
@@ -0,0 +1,256 @@
+import bisect
+import time
+from contextlib import contextmanager
+from enum import Enum
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from a cache hit to a slow LLM reply.
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> LabelValues:
+        values = (labels.get(name, "") for name in self.labelnames)
+        return tuple(
+            str(value.value if isinstance(value, Enum) else value) for value in values
+        )
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        return iter(())
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for name, labelnames, values, value in self.samples():
+            labels = _format_labels(labelnames, values)
+            lines.append(f"{name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        for key, value in sorted(self._values.items()):
+            yield self.name, self.labelnames, key, value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (+Inf last), sum.
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        bucket_labels = self.labelnames + ("le",)
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _format_value(bound)
+                yield f"{self.name}_bucket", bucket_labels, key + (le,), cumulative
+            yield f"{self.name}_sum", self.labelnames, key, total[0]
+            yield f"{self.name}_count", self.labelnames, key, cumulative
+
+
+class CallbackMetric(Metric):
+    """Reads its samples at scrape time, e.g. from a cache's own counters."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Dict[LabelValues, float]],
+        type: str = "gauge",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+        self.type = type
+
+    def samples(self):
+        try:
+            values = self.collect()
+        except Exception as e:
+            print(f"Error collecting {self.name}:", e)
+            return
+        for key, value in sorted(values.items()):
+            yield self.name, self.labelnames, key, value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_seconds = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time spent handling HTTP requests.",
+        ("method", "route", "status"),
+    )
+)
+stage_seconds = registry.register(
+    Histogram(
+        "stage_duration_seconds",
+        "Time spent in one stage of a request: embedding, vector_search, "
+        "mongo_find, mongo_count, llm or serialization.",
+        ("stage",),
+    )
+)
+prompt_tokens = registry.register(
+    Histogram(
+        "chat_prompt_tokens",
+        "Estimated prompt tokens sent to the chat model.",
+        ("model",),
+        buckets=(250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 16000),
+    )
+)
+embedding_failures = registry.register(
+    Counter(
+        "embedding_failures_total",
+        "Texts the embedding backend returned no vector for.",
+    )
+)
+anilist_errors = registry.register(
+    Counter(
+        "anilist_errors_total",
+        "Failed AniList API calls by kind "
+        "(transport, rate_limited, graphql, http_<status>).",
+        ("kind",),
+    )
+)
+
+_cache_stats: Dict[str, Callable[[], dict]] = {}
+
+
+def _cache_counts(fields: Dict[str, str]) -> Dict[LabelValues, float]:
+    """Each cache's ``stats()`` values for ``fields``, labelled by cache."""
+    values = {}
+    for name, stats in _cache_stats.items():
+        current = stats()
+        for field, label in fields.items():
+            if field in current:
+                values[(name, label)] = current[field]
+    return values
+
+
+cache_requests = registry.register(
+    CallbackMetric(
+        "cache_requests_total",
+        "Cache lookups by cache and result.",
+        ("cache", "result"),
+        lambda: _cache_counts({"hits": "hit", "misses": "miss"}),
+        type="counter",
+    )
+)
+cache_evictions = registry.register(
+    CallbackMetric(
+        "cache_evictions_total",
+        "Cache entries dropped by cache and reason (size or expired).",
+        ("cache", "reason"),
+        lambda: _cache_counts({"evictions": "size", "expirations": "expired"}),
+        type="counter",
+    )
+)
+
+
+def register_cache(name: str, stats: Callable[[], dict]):
+    """Export a cache's ``stats()`` as cache_requests_total and
+    cache_evictions_total."""
+    _cache_stats[name] = stats
+
+
+@contextmanager
+def timed(stage: str):
+    """Record how long the ``with`` block took under ``stage``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage=stage)
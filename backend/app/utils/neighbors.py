@@ -0,0 +1,277 @@
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from app.utils.anime_filters import AnimeFilter
+from app.utils.embedding_codec import decode_embedding
+from app.utils.vector_search import ExactVectorIndex, _to_score, vector_index
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne, UpdateOne
+
+NEIGHBORS_TOP_N = int(os.getenv("NEIGHBORS_TOP_N", "50"))
+# Rows scored per matrix product; memory is block_size x catalog x 4 bytes.
+NEIGHBORS_BLOCK_SIZE = int(os.getenv("NEIGHBORS_BLOCK_SIZE", "512"))
+NEIGHBORS_WRITE_BATCH = int(os.getenv("NEIGHBORS_WRITE_BATCH", "500"))
+
+# Nearest animes an updated anime is offered to as a new neighbour.
+NEIGHBORS_UPDATE_CANDIDATES = int(os.getenv("NEIGHBORS_UPDATE_CANDIDATES", "100"))
+
+
+def nearest_neighbors(
+    matrix: np.ndarray,
+    ids: np.ndarray,
+    rows: Optional[np.ndarray] = None,
+    top_n: int = NEIGHBORS_TOP_N,
+    block_size: int = NEIGHBORS_BLOCK_SIZE,
+) -> Iterator[Tuple[int, List[dict]]]:
+    """Yield ``(anime_id, neighbors)`` for ``rows`` (default: every row).
+
+    ``matrix`` must hold L2-normalized rows. Each block of rows is scored
+    against the whole catalog with one matrix product; an anime is never
+    its own neighbour.
+    """
+    if rows is None:
+        rows = np.arange(len(matrix))
+    k = min(top_n, len(matrix) - 1)
+    if k <= 0:
+        for row in rows:
+            yield int(ids[row]), []
+        return
+
+    for start in range(0, len(rows), block_size):
+        block = rows[start : start + block_size]
+        sims = matrix[block] @ matrix.T
+        sims[np.arange(len(block)), block] = -np.inf
+        best = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        best_sims = np.take_along_axis(sims, best, axis=1)
+        order = np.argsort(-best_sims, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        scores = _to_score(np.take_along_axis(best_sims, order, axis=1))
+
+        for row, neighbor_rows, neighbor_scores in zip(block, best, scores):
+            yield int(ids[row]), [
+                {"id": int(ids[n]), "score": round(float(s), 6)}
+                for n, s in zip(neighbor_rows, neighbor_scores)
+            ]
+
+
+def _neighbors_document(anime_id: int, neighbors: List[dict], top_n: int, now) -> dict:
+    return {
+        "_id": anime_id,
+        "neighbors": neighbors,
+        # Score a newcomer has to beat to enter this list; a short list
+        # takes anything.
+        "min_score": neighbors[-1]["score"] if len(neighbors) >= top_n else None,
+        "updated_at": now,
+    }
+
+
+def _min_score_update(top_n: int) -> list:
+    """Pipeline update recomputing ``min_score`` from the stored list."""
+    return [
+        {
+            "$set": {
+                "min_score": {
+                    "$cond": [
+                        {"$gte": [{"$size": "$neighbors"}, top_n]},
+                        {"$arrayElemAt": ["$neighbors.score", -1]},
+                        None,
+                    ]
+                }
+            }
+        }
+    ]
+
+
+async def _write(db: AsyncIOMotorDatabase, operations: list):
+    for start in range(0, len(operations), NEIGHBORS_WRITE_BATCH):
+        batch = operations[start : start + NEIGHBORS_WRITE_BATCH]
+        await db.anime_neighbors.bulk_write(batch, ordered=False)
+
+
+async def build_neighbors(
+    db: AsyncIOMotorDatabase,
+    top_n: int = NEIGHBORS_TOP_N,
+    block_size: int = NEIGHBORS_BLOCK_SIZE,
+) -> int:
+    """Recompute the whole ``anime_neighbors`` table.
+
+    Reuses the search index when it is local; with Atlas search the
+    embeddings are loaded into a temporary exact index.
+    """
+    if isinstance(vector_index, ExactVectorIndex):
+        index = vector_index
+    else:
+        index = ExactVectorIndex()
+    await index.load(db)
+    now = datetime.utcnow()
+    operations = [
+        ReplaceOne(
+            {"_id": anime_id},
+            _neighbors_document(anime_id, neighbors, top_n, now),
+            upsert=True,
+        )
+        for anime_id, neighbors in nearest_neighbors(
+            index.matrix, index.ids, top_n=top_n, block_size=block_size
+        )
+    ]
+    await _write(db, operations)
+    await db.anime_neighbors.delete_many({"_id": {"$nin": index.ids.tolist()}})
+    return len(operations)
+
+
+async def changed_embeddings(
+    db: AsyncIOMotorDatabase, documents: List[dict]
+) -> List[dict]:
+    """The ``documents`` whose embedding differs from the stored one.
+
+    Call it before writing them: animes that are new or were re-embedded
+    are the only ones whose neighbours can change.
+    """
+    stored = {
+        doc["id"]: (doc.get("embedding"), doc.get("embedding_scale"))
+        async for doc in db.animes.find(
+            {"id": {"$in": [document["id"] for document in documents]}},
+            {"_id": 0, "id": 1, "embedding": 1, "embedding_scale": 1},
+        )
+    }
+    return [
+        document
+        for document in documents
+        if stored.get(document["id"])
+        != (document.get("embedding"), document.get("embedding_scale"))
+    ]
+
+
+async def update_neighbors(
+    db: AsyncIOMotorDatabase,
+    documents: List[dict],
+    top_n: int = NEIGHBORS_TOP_N,
+    candidates: int = NEIGHBORS_UPDATE_CANDIDATES,
+):
+    """Fold new or re-embedded animes into an existing neighbours table.
+
+    ``documents`` should hold only animes whose embedding changed (see
+    ``changed_embeddings``). Each is pulled from every list holding its old
+    vector and gets a fresh list from the shared vector index. It is then
+    offered to its ``candidates`` nearest animes, and enters a list only
+    when it beats that list's ``min_score``, through a
+    ``$push``/``$sort``/``$slice`` so the list stays ``top_n`` long, after
+    which ``min_score`` is recomputed. Lists that lost an anime can run
+    short, and animes further away miss the newcomer, until the next
+    ``build_neighbors``.
+    """
+    vectors = {
+        document["id"]: decode_embedding(
+            document["embedding"], document.get("embedding_scale")
+        )
+        for document in documents
+        if len(document.get("embedding") or []) > 0
+    }
+    if not vectors:
+        return
+    if not await db.anime_neighbors.estimated_document_count():
+        # No table yet: build_neighbors creates it, and recommendations fall
+        # back to a live vector search until then.
+        return
+
+    new_ids = list(vectors)
+    now = datetime.utcnow()
+
+    pulled = await db.anime_neighbors.distinct(
+        "_id", {"neighbors.id": {"$in": new_ids}}
+    )
+    if pulled:
+        await db.anime_neighbors.update_many(
+            {"_id": {"$in": pulled}},
+            {"$pull": {"neighbors": {"id": {"$in": new_ids}}}},
+        )
+        await db.anime_neighbors.update_many(
+            {"_id": {"$in": pulled}}, _min_score_update(top_n)
+        )
+
+    hits = await vector_index.search_many(
+        db,
+        list(vectors.values()),
+        [max(top_n, candidates)] * len(new_ids),
+        [AnimeFilter(exclude_ids=[anime_id]) for anime_id in new_ids],
+    )
+    nearby = {hit["id"] for anime_hits in hits for hit in anime_hits}
+    # Animes without a list (including the new ones) never take a newcomer,
+    # short lists take anything.
+    thresholds = {
+        doc["_id"]: doc.get("min_score")
+        async for doc in db.anime_neighbors.find(
+            {"_id": {"$in": list(nearby - set(new_ids))}}, {"min_score": 1}
+        )
+    }
+
+    operations = []
+    entries: Dict[int, List[dict]] = {}
+    for anime_id, anime_hits in zip(new_ids, hits):
+        neighbors = [
+            {"id": hit["id"], "score": round(float(hit["score"]), 6)}
+            for hit in anime_hits[:top_n]
+        ]
+        operations.append(
+            ReplaceOne(
+                {"_id": anime_id},
+                _neighbors_document(anime_id, neighbors, top_n, now),
+                upsert=True,
+            )
+        )
+        for hit in anime_hits:
+            if hit["id"] not in thresholds:
+                continue
+            min_score = thresholds[hit["id"]]
+            if min_score is None or hit["score"] > min_score:
+                entries.setdefault(hit["id"], []).append(
+                    {"id": anime_id, "score": round(float(hit["score"]), 6)}
+                )
+
+    for anime_id, newcomers in entries.items():
+        operations.append(
+            UpdateOne(
+                {"_id": anime_id},
+                {
+                    "$push": {
+                        "neighbors": {
+                            "$each": newcomers,
+                            "$sort": {"score": -1},
+                            "$slice": top_n,
+                        }
+                    },
+                    "$set": {"updated_at": now},
+                },
+            )
+        )
+
+    await _write(db, operations)
+    if entries:
+        await db.anime_neighbors.update_many(
+            {"_id": {"$in": list(entries)}}, _min_score_update(top_n)
+        )
+
+
+async def get_neighbor_ids(
+    db: AsyncIOMotorDatabase, anime_id: int
+) -> Optional[List[int]]:
+    """Precomputed neighbours of ``anime_id``, or None if not in the table."""
+    doc = await db.anime_neighbors.find_one({"_id": anime_id}, {"neighbors.id": 1})
+    if doc is None:
+        return None
+    return [neighbor["id"] for neighbor in doc["neighbors"]]
+
+
+async def get_neighbor_ids_many(
+    db: AsyncIOMotorDatabase, anime_ids: List[int]
+) -> Dict[int, List[int]]:
+    """Precomputed neighbours of each of ``anime_ids`` found in the table."""
+    if not anime_ids:
+        return {}
+    cursor = db.anime_neighbors.find({"_id": {"$in": anime_ids}}, {"neighbors.id": 1})
+    return {
+        doc["_id"]: [neighbor["id"] for neighbor in doc["neighbors"]]
+        async for doc in cursor
+    }
@@ -0,0 +1,58 @@
+import base64
+import json
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+
+def encode_cursor(sort_field: str, anime: dict) -> str:
+    value = None if sort_field == "_id" else anime.get(sort_field)
+    payload = {"s": sort_field, "v": value, "id": str(anime["_id"])}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        last_id = ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if payload.get("s") != sort_field:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort")
+    return payload.get("v"), last_id
+
+
+def keyset_sort(sort_field: str) -> list:
+    if sort_field == "_id":
+        return [("_id", 1)]
+    return [(sort_field, -1), ("_id", 1)]
+
+
+def keyset_filter(sort_field: str, last_value, last_id: ObjectId) -> dict:
+    """Match documents strictly after ``(last_value, last_id)`` in sort order.
+
+    Non-id fields sort descending with nulls last, ties broken by ``_id``.
+    """
+    after_id = {"_id": {"$gt": last_id}}
+    if sort_field == "_id":
+        return after_id
+    if last_value is None:
+        return {sort_field: None, **after_id}
+    return {
+        "$or": [
+            {sort_field: {"$lt": last_value}},
+            {sort_field: last_value, **after_id},
+            {sort_field: None},
+        ]
+    }
+
+
+def total_pages(total: Optional[int], per_page: int) -> Optional[int]:
+    if total is None:
+        return None
+    return (total + per_page - 1) // per_page
@@ -0,0 +1,19 @@
+import os
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[Sequence[int]], k: int = RRF_K
+) -> List[Tuple[int, float]]:
+    """Merge ranked id lists, scoring each id by the sum of 1 / (k + rank).
+
+    Only ranks are used, so rankings whose scores live on different scales
+    (cosine similarity, title similarity) can be combined directly.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, anime_id in enumerate(ranking, start=1):
+            scores[anime_id] = scores.get(anime_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import time
+from typing import Awaitable, Callable, List, Optional, Type
+
+from app.utils.lru import LRUCache
+from app.utils.metrics import timed
+from app.utils.serialization import dump_json
+from fastapi import Request, Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import BaseModel
+from pymongo import ReturnDocument
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+# Seconds clients may reuse a response without revalidating. The default 0
+# makes them send If-None-Match every time, which costs a 304 at most.
+RESPONSE_CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", "0"))
+# How long a worker trusts its copy of the catalog version before
+# re-reading it, so ingestion in another process is picked up quickly.
+CATALOG_VERSION_TTL_SECONDS = float(os.getenv("CATALOG_VERSION_TTL_SECONDS", "5"))
+
+CATALOG_VERSION_ID = "catalog_version"
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class CatalogVersion:
+    """Counter in the ``status`` collection bumped whenever animes change."""
+
+    def __init__(self, ttl_seconds: float = CATALOG_VERSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._version: Optional[int] = None
+        self._checked_at = float("-inf")
+        self._listeners: List[Callable[[AsyncIOMotorDatabase, int], Awaitable]] = []
+
+    def on_change(self, listener: Callable[[AsyncIOMotorDatabase, int], Awaitable]):
+        """Await ``listener(db, version)`` before handing out a newly read version.
+
+        Responses cached under a version are then built from in-process state
+        that has already caught up with it.
+        """
+        self._listeners.append(listener)
+
+    async def current(self, db: AsyncIOMotorDatabase) -> int:
+        if time.monotonic() - self._checked_at >= self.ttl_seconds:
+            await self.refresh(db)
+        return self._version
+
+    async def refresh(self, db: AsyncIOMotorDatabase) -> int:
+        doc = await db.status.find_one({"_id": CATALOG_VERSION_ID})
+        version = doc["version"] if doc else 0
+        if self._version is not None and version != self._version:
+            for listener in self._listeners:
+                try:
+                    await listener(db, version)
+                except Exception as e:
+                    print("Error handling catalog version change:", e)
+        self._version = version
+        self._checked_at = time.monotonic()
+        return self._version
+
+    async def bump(self, db: AsyncIOMotorDatabase) -> int:
+        doc = await db.status.find_one_and_update(
+            {"_id": CATALOG_VERSION_ID},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._version = doc["version"]
+        self._checked_at = time.monotonic()
+        return self._version
+
+
+class ResponseCache:
+    """LRU of serialized JSON responses for read-only catalog endpoints.
+
+    Entries are tagged with the catalog version they were built from and
+    are rebuilt once it moves on. Every response carries an ETag, and a
+    matching If-None-Match gets a 304 without a body.
+    """
+
+    def __init__(
+        self,
+        max_size: int = RESPONSE_CACHE_SIZE,
+        max_age: int = RESPONSE_CACHE_MAX_AGE,
+        version: Optional[CatalogVersion] = None,
+    ):
+        self.entries = LRUCache(max_size)
+        self.max_age = max_age
+        self.version = version or CatalogVersion()
+        self.not_modified = 0
+
+    @staticmethod
+    def key(request: Request) -> str:
+        query = "&".join(sorted(str(request.query_params).split("&")))
+        return f"{request.url.path}?{query}"
+
+    async def respond(
+        self,
+        request: Request,
+        db: AsyncIOMotorDatabase,
+        response_model: Type[BaseModel],
+        build: Callable[[], Awaitable[dict]],
+    ) -> Response:
+        version = await self.version.current(db)
+        key = self.key(request)
+
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != version:
+            data = await build()
+            with timed("serialization"):
+                body = dump_json(data, response_model)
+            etag = f'"{version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+            entry = (version, etag, body)
+            self.entries.set(key, entry)
+
+        _, etag, body = entry
+        cache_control = (
+            f"public, max-age={self.max_age}" if self.max_age else "no-cache"
+        )
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {**self.entries.stats(), "notModified": self.not_modified}
+
+
+catalog_version = CatalogVersion()
+response_cache = ResponseCache(version=catalog_version)
@@ -0,0 +1,144 @@
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional
+
+import numpy as np
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1000"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+
+
+@dataclass
+class CachedReply:
+    model_id: str
+    context_ids: FrozenSet[int]
+    reply: str
+    expires_at: float
+    slot: int
+
+
+class _ModelSlots:
+    """Fixed-size matrix of normalized query vectors for a single model."""
+
+    def __init__(self, capacity: int, dim: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.keys: list[Optional[int]] = [None] * capacity
+        self.free = list(range(capacity - 1, -1, -1))
+
+
+class SemanticCache:
+    """Reuses chatbot replies for near-duplicate questions.
+
+    A lookup hits when a cached query for the same model has cosine
+    similarity of at least ``threshold`` and was answered from the same set
+    of retrieved anime. Entries expire after ``ttl_seconds`` and the least
+    recently used one is evicted once ``max_size`` is reached.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_size: int = SEMANTIC_CACHE_SIZE,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+    ):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[int, CachedReply] = OrderedDict()
+        self._models: Dict[str, _ModelSlots] = {}
+        self._next_key = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, key: int):
+        entry = self._entries.pop(key)
+        slots = self._models[entry.model_id]
+        slots.keys[entry.slot] = None
+        slots.vectors[entry.slot] = 0
+        slots.free.append(entry.slot)
+
+    def get(self, model_id: str, query_vector, context_ids) -> Optional[str]:
+        slots = self._models.get(model_id)
+        if slots is None or query_vector is None:
+            self.misses += 1
+            return None
+
+        query = self._normalize(query_vector)
+        if query.shape[0] != slots.vectors.shape[1]:
+            self.misses += 1
+            return None
+
+        context_ids = frozenset(context_ids)
+        similarities = slots.vectors @ query
+        now = time.monotonic()
+        for slot in np.argsort(-similarities):
+            if similarities[slot] < self.threshold:
+                break
+            key = slots.keys[slot]
+            if key is None:
+                continue
+            entry = self._entries[key]
+            if entry.expires_at < now:
+                self._remove(key)
+                continue
+            if entry.context_ids == context_ids:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.reply
+
+        self.misses += 1
+        return None
+
+    def put(self, model_id: str, query_vector, context_ids, reply: str):
+        if query_vector is None or not reply:
+            return
+        query = self._normalize(query_vector)
+        slots = self._models.get(model_id)
+        if slots is None:
+            slots = _ModelSlots(self.max_size, query.shape[0])
+            self._models[model_id] = slots
+
+        # Each model has max_size slots, so a model can only run out of slots
+        # when it owns every entry, and then the LRU entry frees one of them.
+        while len(self._entries) >= self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+        slot = slots.free.pop()
+        key = self._next_key
+        self._next_key += 1
+        slots.vectors[slot] = query
+        slots.keys[slot] = key
+        self._entries[key] = CachedReply(
+            model_id=model_id,
+            context_ids=frozenset(context_ids),
+            reply=reply,
+            expires_at=time.monotonic() + self.ttl_seconds,
+            slot=slot,
+        )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+semantic_cache = SemanticCache()
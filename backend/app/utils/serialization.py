@@ -0,0 +1,33 @@
+import os
+from typing import Any, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+# "validated" builds the response model before serializing; "fast" writes
+# rows straight to JSON. Only use "fast" for payloads whose rows come from
+# anime_rows.to_anime_out, which already have exactly the response shape.
+RESPONSE_SERIALIZATION = os.getenv("RESPONSE_SERIALIZATION", "validated")
+
+
+def fast_serialization() -> bool:
+    return RESPONSE_SERIALIZATION == "fast"
+
+
+def dump_json(payload: Any, response_model: Type[BaseModel]) -> bytes:
+    if fast_serialization():
+        return to_json(payload)
+    model = response_model.model_validate(payload)
+    return model.model_dump_json(by_alias=True).encode()
+
+
+def json_response(payload: Any):
+    """Hand ``payload`` to FastAPI, or skip its response_model round trip.
+
+    Routes keep their ``response_model`` so the OpenAPI schema does not
+    change; FastAPI does not validate responses that are already a Response.
+    """
+    if fast_serialization():
+        return Response(to_json(payload), media_type="application/json")
+    return payload
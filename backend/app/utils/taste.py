@@ -0,0 +1,165 @@
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+from app.schemas.animes import AnimeStatus
+from app.utils.embedding_codec import decode_embedding, encode_embedding
+from app.utils.vector_search import ExactVectorIndex, _normalize, vector_index
+from app.utils.watchlists import is_anime_id
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+# How much each watchlist status pulls the taste vector towards an anime.
+# Dropped titles push it away; planned ones are only listed, not watched.
+STATUS_WEIGHTS = {
+    AnimeStatus.COMPLETED: 1.0,
+    AnimeStatus.WATCHING: 0.8,
+    AnimeStatus.PAUSED: 0.3,
+    AnimeStatus.PLANNED: 0.0,
+    AnimeStatus.DROPPED: -0.5,
+}
+TASTE_UPDATE_RETRIES = 5
+
+
+def status_weight(status: Optional[str]) -> float:
+    if not status:
+        return 0.0
+    try:
+        return STATUS_WEIGHTS.get(AnimeStatus(status), 0.0)
+    except ValueError:
+        return 0.0
+
+
+async def anime_vector(db: AsyncIOMotorDatabase, anime_id: int) -> Optional[np.ndarray]:
+    if isinstance(vector_index, ExactVectorIndex):
+        vector = vector_index.vector(anime_id)
+        if vector is not None:
+            return vector
+
+    anime = await db.animes.find_one(
+        {"id": anime_id}, {"_id": 0, "embedding": 1, "embedding_scale": 1}
+    )
+    if not anime:
+        return None
+    vector = decode_embedding(anime.get("embedding"), anime.get("embedding_scale"))
+    if vector is None or len(vector) == 0:
+        return None
+    return _normalize(vector.astype(np.float32))
+
+
+async def update_taste(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    anime_id: str,
+    status: Optional[str],
+):
+    """Apply one watchlist change to the user's taste vector.
+
+    ``user_taste`` keeps the weighted sum of the listed animes' normalized
+    embeddings and the weight each anime contributed, so a change only adds
+    ``(new_weight - old_weight) * embedding``. ``status=None`` removes the
+    anime. Writes are guarded by a version number and retried on conflict.
+    Users without a taste document yet get one built from their watchlist.
+    """
+    if not is_anime_id(anime_id):
+        # It would be a nested field path, and never a listed anime.
+        return
+    new_weight = None if status is None else status_weight(status)
+    key = f"weights.{anime_id}"
+    vector = None
+
+    for _ in range(TASTE_UPDATE_RETRIES):
+        taste = await db.user_taste.find_one(
+            {"_id": user_id}, {"vector": 1, "version": 1, key: 1}
+        )
+        if taste is None:
+            # The rebuild may lose to a concurrent one whose snapshot of the
+            # watchlist predates this change, so apply it on top regardless.
+            if await rebuild_taste(db, user_id) is None:
+                return
+            continue
+        old_weight = taste.get("weights", {}).get(anime_id)
+        delta = (new_weight or 0.0) - (old_weight or 0.0)
+
+        update = {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}}
+        if new_weight is None:
+            if old_weight is None:
+                return
+            update["$unset"] = {key: ""}
+        else:
+            update["$set"][key] = new_weight
+
+        if delta:
+            if vector is None:
+                vector = await anime_vector(db, int(anime_id))
+            if vector is not None:
+                total = decode_embedding(taste.get("vector"))
+                if total is None:
+                    total = np.zeros_like(vector)
+                update["$set"]["vector"] = encode_embedding(
+                    total + delta * vector, "float32"
+                )[0]
+
+        result = await db.user_taste.update_one(
+            {"_id": user_id, "version": taste["version"]}, update
+        )
+        if result.matched_count:
+            return
+
+    print(f"Error updating taste vector for {user_id}: too many conflicts")
+
+
+async def rebuild_taste(db: AsyncIOMotorDatabase, user_id: str) -> Optional[dict]:
+    """Compute a taste document from scratch, for watchlists that predate it."""
+    watchlist = await db.watchlist.find_one({"user_id": user_id}, {"animes": 1})
+    if not watchlist or not watchlist.get("animes"):
+        return None
+
+    weights, total = {}, None
+    for item in watchlist["animes"]:
+        anime_id = str(item["anime_id"])
+        if not is_anime_id(anime_id):
+            continue
+        weights[anime_id] = status_weight(item.get("user_anime_status"))
+        vector = await anime_vector(db, int(anime_id)) if weights[anime_id] else None
+        if vector is not None:
+            total = weights[anime_id] * vector + (0 if total is None else total)
+
+    taste = {
+        "_id": user_id,
+        "weights": weights,
+        "vector": None if total is None else encode_embedding(total, "float32")[0],
+        "version": 1,
+        "updated_at": datetime.utcnow(),
+    }
+    try:
+        await db.user_taste.insert_one(taste)
+    except DuplicateKeyError:
+        # A concurrent watchlist change created it first.
+        return await db.user_taste.find_one({"_id": user_id})
+    return taste
+
+
+async def get_taste(db: AsyncIOMotorDatabase, user_id: str) -> Optional[dict]:
+    taste = await db.user_taste.find_one({"_id": user_id})
+    return taste or await rebuild_taste(db, user_id)
+
+
+def taste_vector(taste: Optional[dict]) -> Optional[List[float]]:
+    """The normalized taste vector, or None until something was liked."""
+    if not taste or taste.get("vector") is None:
+        return None
+    weights = taste.get("weights", {}).values()
+    if not any(isinstance(w, (int, float)) and w > 0 for w in weights):
+        return None
+    vector = decode_embedding(taste["vector"])
+    if not np.any(vector):
+        return None
+    return _normalize(vector).tolist()
+
+
+def listed_anime_ids(taste: dict) -> List[int]:
+    # Documents written before anime ids were validated may hold other keys.
+    return [
+        int(anime_id) for anime_id in taste.get("weights", {}) if is_anime_id(anime_id)
+    ]
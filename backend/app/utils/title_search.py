@@ -0,0 +1,163 @@
+import asyncio
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+TITLE_SEARCH_MIN_SCORE = float(os.getenv("TITLE_SEARCH_MIN_SCORE", "0.45"))
+# How many trigram-overlap candidates get a full similarity score when
+# ranking; filters score every candidate so no match is left out.
+TITLE_SEARCH_CANDIDATES = int(os.getenv("TITLE_SEARCH_CANDIDATES", "200"))
+# Max matches used when a title query filters another listing.
+TITLE_FILTER_LIMIT = int(os.getenv("TITLE_FILTER_LIMIT", "2000"))
+
+
+def normalize_title(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def trigrams(text: str, prefix_only: bool = False) -> set:
+    """Word trigrams padded at the front, and at the back unless ``prefix_only``.
+
+    Queries use ``prefix_only`` so a half-typed word still matches the start
+    of a longer title word.
+    """
+    grams = set()
+    for word in text.split():
+        padded = f"  {word}" if prefix_only else f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TitleSearchIndex:
+    """In-memory trigram index over romaji, English and synonym titles.
+
+    Candidates are gathered from the trigram posting lists and ranked by
+    exact > prefix > word-prefix > substring > trigram coverage, which makes
+    autocomplete tolerant to typos like "narto" for "naruto".
+    """
+
+    def __init__(self, min_score: float = TITLE_SEARCH_MIN_SCORE):
+        self.min_score = min_score
+        self._titles: dict[int, List[Tuple[str, set]]] = {}
+        self._postings: dict[str, set] = {}
+        self._loaded = False
+        self._lock: Optional[asyncio.Lock] = None
+
+    def __len__(self):
+        return len(self._titles)
+
+    async def load(self, db: AsyncIOMotorDatabase):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._loaded:
+                return
+            self.add(await self._find(db, {}))
+            self._loaded = True
+
+    async def _find(self, db: AsyncIOMotorDatabase, query: dict) -> List[dict]:
+        cursor = db.animes.find(query, {"_id": 0, "id": 1, "title": 1, "synonyms": 1})
+        return [doc async for doc in cursor]
+
+    async def refresh(self, db: AsyncIOMotorDatabase, query: dict) -> int:
+        """Re-read the animes matching ``query`` into the index."""
+        if not self._loaded:
+            return 0
+        animes = await self._find(db, query)
+        self.add(animes)
+        return len(animes)
+
+    def add(self, animes: Iterable[dict]):
+        for anime in animes:
+            anime_id = anime.get("id")
+            if anime_id is None:
+                continue
+            self.remove(anime_id)
+
+            title = anime.get("title") or {}
+            names = [title.get("romaji"), title.get("english")]
+            names += anime.get("synonyms") or []
+            entries = []
+            for name in dict.fromkeys(normalize_title(n) for n in names if n):
+                if not name:
+                    continue
+                grams = trigrams(name)
+                entries.append((name, grams))
+                for gram in grams:
+                    self._postings.setdefault(gram, set()).add(anime_id)
+            self._titles[anime_id] = entries
+
+    def remove(self, anime_id: int):
+        for _, grams in self._titles.pop(anime_id, []):
+            for gram in grams:
+                posting = self._postings.get(gram)
+                if posting is not None:
+                    posting.discard(anime_id)
+                    if not posting:
+                        del self._postings[gram]
+
+    @staticmethod
+    def _score(query: str, query_grams: set, name: str, grams: set) -> float:
+        if name == query:
+            return 1.0
+        if name.startswith(query):
+            return 0.95
+        if f" {query}" in f" {name}":
+            return 0.9
+        if query in name:
+            return 0.8
+        return 0.75 * len(query_grams & grams) / len(query_grams)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        candidates: Optional[int] = TITLE_SEARCH_CANDIDATES,
+    ) -> List[Tuple[int, float]]:
+        """Best title matches for ``query``.
+
+        Only the ``candidates`` ids sharing the most trigrams with the query
+        are scored; ``None`` scores all of them. Every title containing the
+        query scores above ``min_score``, so an unlimited search returns all
+        substring matches plus fuzzy ones.
+        """
+        query = normalize_title(query)
+        if not query:
+            return []
+        query_grams = trigrams(query, prefix_only=True)
+
+        overlap = Counter()
+        for gram in query_grams:
+            overlap.update(self._postings.get(gram, ()))
+
+        ranked = []
+        for anime_id, _ in overlap.most_common(candidates):
+            score, length = max(
+                (self._score(query, query_grams, name, grams), -len(name))
+                for name, grams in self._titles[anime_id]
+            )
+            if score >= self.min_score:
+                ranked.append((score, length, anime_id))
+
+        ranked.sort(key=lambda r: (-r[0], -r[1], r[2]))
+        return [(anime_id, round(score, 4)) for score, _, anime_id in ranked[:limit]]
+
+    async def search_ids(
+        self,
+        db: AsyncIOMotorDatabase,
+        query: str,
+        limit: int = 10,
+        candidates: Optional[int] = TITLE_SEARCH_CANDIDATES,
+    ) -> List[int]:
+        if not self._loaded:
+            await self.load(db)
+        return [anime_id for anime_id, _ in self.search(query, limit, candidates)]
+
+
+title_index = TitleSearchIndex()
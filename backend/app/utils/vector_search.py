@@ -0,0 +1,524 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from app.schemas.animes import ANIME_OUT_PROJECTION
+from app.utils.anime_filters import AnimeFilter
+from app.utils.embedding_codec import (
+    EMBEDDING_STORAGE,
+    decode_embedding,
+    encode_embedding,
+)
+from app.utils.metrics import timed
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+# "atlas" uses the $vectorSearch stage, "exact" and "ivf" search an
+# in-process copy of the embeddings.
+VECTOR_SEARCH_BACKEND = os.getenv("VECTOR_SEARCH_BACKEND", "atlas")
+VECTOR_INDEX_NAME = os.getenv("VECTOR_INDEX_NAME", "embeddings_vector_index")
+IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "8"))
+IVF_MIN_TRAIN_SIZE = int(os.getenv("VECTOR_IVF_MIN_TRAIN_SIZE", "2048"))
+# Candidates examined per requested result, before adjusting for filters.
+NUM_CANDIDATES_FACTOR = int(os.getenv("VECTOR_NUM_CANDIDATES_FACTOR", "10"))
+# Atlas rejects numCandidates above 10000.
+MAX_NUM_CANDIDATES = int(os.getenv("VECTOR_MAX_NUM_CANDIDATES", "10000"))
+
+SEASON_CODES = {"WINTER": 1, "SPRING": 2, "SUMMER": 3, "FALL": 4}
+# Fields the in-process indexes keep per anime.
+INDEX_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "embedding": 1,
+    "embedding_scale": 1,
+    "genres": 1,
+    "averageScore": 1,
+    "season": 1,
+    "seasonYear": 1,
+}
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _to_score(cosine: np.ndarray) -> np.ndarray:
+    # Same scale as Atlas' vectorSearchScore for cosine indexes.
+    return (1.0 + cosine) / 2.0
+
+
+def tune_num_candidates(limit: int, selectivity: float = 1.0) -> int:
+    """Scale the candidate pool with ``limit`` and inversely with selectivity.
+
+    ``selectivity`` is the fraction of the catalog that passes the filters;
+    a filter keeping 5% of the animes needs 20x the candidates to find the
+    same number of good matches.
+    """
+    selectivity = min(max(selectivity, 1e-3), 1.0)
+    wanted = int(np.ceil(limit * NUM_CANDIDATES_FACTOR / selectivity))
+    return max(limit, min(wanted, MAX_NUM_CANDIDATES))
+
+
+class VectorSearchBackend(ABC):
+    @abstractmethod
+    async def search(
+        self,
+        db: AsyncIOMotorDatabase,
+        query_vector: List[float],
+        limit: int,
+        num_candidates: Optional[int] = None,
+        filters: Optional[AnimeFilter] = None,
+    ) -> List[dict]:
+        """Return up to ``limit`` anime documents with a ``score`` field.
+
+        ``filters`` are applied before ranking, so the result holds up to
+        ``limit`` matching animes instead of the matching part of the top
+        ``limit``. ``num_candidates`` defaults to :func:`tune_num_candidates`.
+        """
+
+    async def search_many(
+        self,
+        db: AsyncIOMotorDatabase,
+        query_vectors: List[List[float]],
+        limits: List[int],
+        filters: List[Optional[AnimeFilter]],
+    ) -> List[List[dict]]:
+        """:meth:`search` for several queries at once, run concurrently."""
+        return list(
+            await asyncio.gather(
+                *(
+                    self.search(db, vector, limit, filters=query_filters)
+                    for vector, limit, query_filters in zip(
+                        query_vectors, limits, filters
+                    )
+                )
+            )
+        )
+
+    async def load(self, db: AsyncIOMotorDatabase):
+        pass
+
+    async def refresh(self, db: AsyncIOMotorDatabase, query: dict) -> int:
+        """Re-read the animes matching ``query`` into an in-process index."""
+        return 0
+
+    def add(self, animes: Iterable[dict]):
+        pass
+
+
+class AtlasVectorSearch(VectorSearchBackend):
+    def __init__(self, index_name: str = VECTOR_INDEX_NAME):
+        self.index_name = index_name
+
+    async def selectivity(self, db: AsyncIOMotorDatabase, mongo_filter: dict) -> float:
+        if not mongo_filter:
+            return 1.0
+        total = await db.animes.estimated_document_count()
+        if not total:
+            return 1.0
+        return await db.animes.count_documents(mongo_filter) / total
+
+    async def search(self, db, query_vector, limit, num_candidates=None, filters=None):
+        # The query has to use the same vector type as the stored embeddings.
+        query_vector, _ = encode_embedding(query_vector, EMBEDDING_STORAGE)
+        mongo_filter = filters.to_mongo() if filters else {}
+        if num_candidates is None:
+            selectivity = await self.selectivity(db, mongo_filter)
+            num_candidates = tune_num_candidates(limit, selectivity)
+
+        vector_search = {
+            "index": self.index_name,
+            "path": "embedding",
+            "queryVector": query_vector,
+            "numCandidates": max(num_candidates, limit),
+            "limit": limit,
+        }
+        if mongo_filter:
+            # Every field used here must be declared as a "filter" field
+            # in the Atlas vector index definition.
+            vector_search["filter"] = mongo_filter
+
+        pipeline = [
+            {"$vectorSearch": vector_search},
+            {
+                "$project": {
+                    **ANIME_OUT_PROJECTION,
+                    "score": {"$meta": "vectorSearchScore"},
+                }
+            },
+        ]
+        with timed("vector_search"):
+            cursor = db.animes.aggregate(pipeline)
+            return [doc async for doc in cursor]
+
+
+class ExactVectorIndex(VectorSearchBackend):
+    """Brute-force cosine search over an in-memory float32 matrix.
+
+    Rows are L2-normalized on insert so a search is a single mat-vec
+    product followed by ``argpartition``. The matrix grows geometrically
+    so incremental inserts stay amortized O(1).
+
+    Genres, score, season and year are kept in parallel columns so filters
+    become a boolean row mask applied before ranking.
+    """
+
+    def __init__(self):
+        self.dim: Optional[int] = None
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._rows: dict[int, int] = {}
+        self._genres = np.zeros((0, 0), dtype=bool)
+        self._genre_columns: dict[str, int] = {}
+        self._scores = np.zeros(0, dtype=np.float32)
+        self._seasons = np.zeros(0, dtype=np.int8)
+        self._years = np.zeros(0, dtype=np.int32)
+        self._loaded = False
+        self._lock: Optional[asyncio.Lock] = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix[: self._size]
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[: self._size]
+
+    async def load(self, db: AsyncIOMotorDatabase):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._loaded:
+                return
+            self.add(await self._find(db, {}))
+            self._loaded = True
+
+    async def _find(self, db: AsyncIOMotorDatabase, query: dict) -> List[dict]:
+        query = {**query, "embedding": {"$exists": True, "$nin": [None, []]}}
+        return [doc async for doc in db.animes.find(query, INDEX_PROJECTION)]
+
+    async def refresh(self, db: AsyncIOMotorDatabase, query: dict) -> int:
+        # An unloaded index reads everything on first use anyway.
+        if not self._loaded:
+            return 0
+        return len(self.add(await self._find(db, query)))
+
+    def _reserve(self, rows: int):
+        capacity = self._matrix.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, 64)
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        matrix[: self._size] = self.matrix
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        ids[: self._size] = self.ids
+        self._matrix, self._ids = matrix, ids
+
+        genres = np.zeros((new_capacity, self._genres.shape[1]), dtype=bool)
+        genres[: self._size] = self._genres[: self._size]
+        scores = np.full(new_capacity, np.nan, dtype=np.float32)
+        scores[: self._size] = self._scores[: self._size]
+        seasons = np.zeros(new_capacity, dtype=np.int8)
+        seasons[: self._size] = self._seasons[: self._size]
+        years = np.zeros(new_capacity, dtype=np.int32)
+        years[: self._size] = self._years[: self._size]
+        self._genres, self._scores = genres, scores
+        self._seasons, self._years = seasons, years
+
+    def _genre_column(self, genre: str) -> int:
+        column = self._genre_columns.get(genre)
+        if column is None:
+            column = len(self._genre_columns)
+            self._genre_columns[genre] = column
+            extra = np.zeros((self._genres.shape[0], 1), dtype=bool)
+            self._genres = np.hstack([self._genres, extra])
+        return column
+
+    def _set_metadata(self, row: int, anime: dict):
+        self._genres[row] = False
+        for genre in anime.get("genres") or []:
+            column = self._genre_column(genre)
+            self._genres[row, column] = True
+        score = anime.get("averageScore")
+        self._scores[row] = np.nan if score is None else score
+        self._seasons[row] = SEASON_CODES.get(anime.get("season") or "", 0)
+        self._years[row] = anime.get("seasonYear") or 0
+
+    def add(self, animes: Iterable[dict]) -> List[int]:
+        pairs = [
+            (
+                anime,
+                decode_embedding(anime["embedding"], anime.get("embedding_scale")),
+            )
+            for anime in animes
+            if anime.get("id") is not None and len(anime.get("embedding") or []) > 0
+        ]
+        if not pairs:
+            return []
+
+        vectors = _normalize(np.stack([v for _, v in pairs]).astype(np.float32))
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._reserve(self._size + len(pairs))
+
+        touched = []
+        for (anime, _), vector in zip(pairs, vectors):
+            anime_id = anime["id"]
+            row = self._rows.get(anime_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._rows[anime_id] = row
+                self._ids[row] = anime_id
+            self._matrix[row] = vector
+            self._set_metadata(row, anime)
+            touched.append(row)
+        return touched
+
+    def row(self, anime_id: int) -> Optional[int]:
+        return self._rows.get(anime_id)
+
+    def vector(self, anime_id: int) -> Optional[np.ndarray]:
+        row = self._rows.get(anime_id)
+        return None if row is None else self._matrix[row]
+
+    def mask(self, filters: Optional[AnimeFilter]) -> Optional[np.ndarray]:
+        """Rows passing ``filters``, with the same semantics as ``to_mongo``."""
+        if filters is None or filters.is_empty():
+            return None
+        size = self._size
+        mask = np.ones(size, dtype=bool)
+
+        if filters.genre:
+            column = self._genre_columns.get(filters.genre)
+            if column is None:
+                return np.zeros(size, dtype=bool)
+            mask &= self._genres[:size, column]
+
+        # NaN (no score) fails both comparisons, like a missing field in Mongo.
+        with np.errstate(invalid="ignore"):
+            if filters.min_score:
+                mask &= self._scores[:size] >= filters.min_score
+            if filters.max_score:
+                mask &= self._scores[:size] <= filters.max_score
+
+        if filters.season:
+            code = SEASON_CODES.get(filters.season)
+            if code is None:
+                return np.zeros(size, dtype=bool)
+            mask &= self._seasons[:size] == code
+
+        if filters.year:
+            mask &= self._years[:size] == filters.year
+
+        for anime_id in filters.exclude_ids:
+            row = self._rows.get(anime_id)
+            if row is not None:
+                mask[row] = False
+        return mask
+
+    def _candidate_rows(
+        self, query: np.ndarray, num_candidates: int, mask: Optional[np.ndarray]
+    ) -> Optional[np.ndarray]:
+        return None
+
+    def top_k(
+        self,
+        query_vector,
+        limit: int,
+        num_candidates: Optional[int] = None,
+        filters: Optional[AnimeFilter] = None,
+    ) -> List[Tuple[int, float]]:
+        if self._size == 0 or limit <= 0:
+            return []
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+
+        mask = self.mask(filters)
+        if num_candidates is None:
+            selectivity = 1.0 if mask is None else mask.mean()
+            num_candidates = tune_num_candidates(limit, selectivity)
+
+        rows = self._candidate_rows(query, num_candidates, mask)
+        if rows is None:
+            rows = np.arange(self._size) if mask is None else np.flatnonzero(mask)
+        elif mask is not None:
+            rows = rows[mask[rows]]
+        if len(rows) == 0:
+            return []
+        scores = self._matrix[rows] @ query
+
+        k = min(limit, len(rows))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            (int(self._ids[rows[i]]), float(s))
+            for i, s in zip(best, _to_score(scores[best]))
+        ]
+
+    def top_k_many(
+        self,
+        query_vectors: List[List[float]],
+        limits: List[int],
+        filters: List[Optional[AnimeFilter]],
+    ) -> List[List[Tuple[int, float]]]:
+        """:meth:`top_k` for several queries with one matrix product."""
+        if self._size == 0 or not query_vectors:
+            return [[] for _ in query_vectors]
+        queries = _normalize(np.asarray(query_vectors, dtype=np.float32))
+        all_scores = queries @ self.matrix.T
+
+        hits = []
+        for scores, limit, query_filters in zip(all_scores, limits, filters):
+            mask = self.mask(query_filters)
+            rows = np.arange(self._size) if mask is None else np.flatnonzero(mask)
+            if len(rows) == 0 or limit <= 0:
+                hits.append([])
+                continue
+            scores = scores[rows]
+            k = min(limit, len(rows))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            hits.append(
+                [
+                    (int(self._ids[rows[i]]), float(s))
+                    for i, s in zip(best, _to_score(scores[best]))
+                ]
+            )
+        return hits
+
+    async def _with_documents(
+        self, db: AsyncIOMotorDatabase, hits: List[List[Tuple[int, float]]]
+    ) -> List[List[dict]]:
+        ids = list({anime_id for query_hits in hits for anime_id, _ in query_hits})
+        if not ids:
+            return [[] for _ in hits]
+        with timed("mongo_find"):
+            cursor = db.animes.find({"id": {"$in": ids}}, ANIME_OUT_PROJECTION)
+            docs = {doc["id"]: doc async for doc in cursor}
+        return [
+            [
+                {**docs[anime_id], "score": score}
+                for anime_id, score in query_hits
+                if anime_id in docs
+            ]
+            for query_hits in hits
+        ]
+
+    async def search(self, db, query_vector, limit, num_candidates=None, filters=None):
+        if not self._loaded:
+            await self.load(db)
+
+        with timed("vector_search"):
+            hits = self.top_k(query_vector, limit, num_candidates, filters)
+        return (await self._with_documents(db, [hits]))[0]
+
+    async def search_many(self, db, query_vectors, limits, filters):
+        if not self._loaded:
+            await self.load(db)
+
+        with timed("vector_search"):
+            hits = self.top_k_many(query_vectors, limits, filters)
+        return await self._with_documents(db, hits)
+
+
+class IVFVectorIndex(ExactVectorIndex):
+    """Inverted-file index: k-means coarse quantizer plus exact re-ranking.
+
+    Only the ``nprobe`` lists closest to the query are scanned. Until the
+    catalog reaches ``min_train_size`` it behaves like the exact index, and
+    it re-trains whenever the catalog has doubled since the last training.
+    """
+
+    def __init__(
+        self, nprobe: int = IVF_NPROBE, min_train_size: int = IVF_MIN_TRAIN_SIZE
+    ):
+        super().__init__()
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._trained_size = 0
+
+    def train(self, iterations: int = 10, seed: int = 0):
+        data = self.matrix
+        nlist = max(1, int(np.sqrt(len(data))))
+        rng = np.random.default_rng(seed)
+        centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        self._centroids = centroids
+        self._lists = [np.flatnonzero(assignment == c) for c in range(nlist)]
+        self._trained_size = len(data)
+
+    def add(self, animes: Iterable[dict]) -> List[int]:
+        before = self._size
+        touched = super().add(animes)
+
+        if self._size >= self.min_train_size and self._size >= 2 * self._trained_size:
+            self.train()
+        elif self._centroids is not None:
+            new_rows = np.asarray([r for r in touched if r >= before], dtype=np.int64)
+            if len(new_rows):
+                assignment = np.argmax(
+                    self._matrix[new_rows] @ self._centroids.T, axis=1
+                )
+                for c in np.unique(assignment):
+                    self._lists[c] = np.concatenate(
+                        [self._lists[c], new_rows[assignment == c]]
+                    )
+        return touched
+
+    def top_k_many(self, query_vectors, limits, filters):
+        if self._centroids is None:
+            return super().top_k_many(query_vectors, limits, filters)
+        # Each query probes its own lists, so there is no shared product.
+        return [
+            self.top_k(vector, limit, filters=query_filters)
+            for vector, limit, query_filters in zip(query_vectors, limits, filters)
+        ]
+
+    def _candidate_rows(self, query, num_candidates, mask):
+        if self._centroids is None:
+            return None
+        nprobe = min(self.nprobe, len(self._lists))
+        order = np.argsort(-(self._centroids @ query))
+
+        # Probe at least nprobe lists, then keep going while a selective
+        # filter leaves fewer than num_candidates rows to rank.
+        lists, found = [], 0
+        for i, c in enumerate(order):
+            if i >= nprobe and found >= num_candidates:
+                break
+            lists.append(self._lists[c])
+            found += len(self._lists[c]) if mask is None else mask[self._lists[c]].sum()
+        rows = np.concatenate(lists)
+        return rows if len(rows) else None
+
+
+def create_vector_backend(name: str = VECTOR_SEARCH_BACKEND) -> VectorSearchBackend:
+    if name == "atlas":
+        return AtlasVectorSearch()
+    if name == "exact":
+        return ExactVectorIndex()
+    if name == "ivf":
+        return IVFVectorIndex()
+    raise ValueError(f"Unknown vector search backend: {name}")
+
+
+vector_index = create_vector_backend()
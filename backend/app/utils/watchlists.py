@@ -0,0 +1,105 @@
+from typing import List, Optional
+
+from app.schemas.animes import ANIME_OUT_PROJECTION
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+
+def is_anime_id(anime_id) -> bool:
+    anime_id = str(anime_id)
+    return anime_id.isascii() and anime_id.isdigit()
+
+
+async def get_watchlist_anime_ids(db: AsyncIOMotorDatabase, user_id: str) -> List[int]:
+    watchlist = await db.watchlist.find_one(
+        {"user_id": user_id}, {"_id": 0, "animes.anime_id": 1}
+    )
+    if not watchlist:
+        return []
+    # Watchlist entries store the AniList id as a string.
+    return [
+        int(item["anime_id"])
+        for item in watchlist.get("animes", [])
+        if is_anime_id(item.get("anime_id", ""))
+    ]
+
+
+def watchlist_pipeline(
+    user_id: str,
+    status: Optional[str] = None,
+    anime_id: Optional[str] = None,
+    newest_first: bool = True,
+    skip: int = 0,
+    limit: Optional[int] = None,
+) -> List[dict]:
+    """Aggregation returning watchlist entries joined with their anime.
+
+    Entries whose anime is missing are dropped. When paging, that happens
+    before ``$skip``/``$limit`` through an ``_id``-only lookup on the ``id``
+    index, so every page but the last is full, and only the page is joined
+    with the ``AnimeOut`` fields.
+    """
+    entry_filter = {}
+    if status:
+        entry_filter["animes.user_anime_status"] = status
+    if anime_id is not None:
+        entry_filter["animes.anime_id"] = anime_id
+
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$project": {"_id": 0, "animes": 1}},
+        {"$unwind": "$animes"},
+    ]
+    if entry_filter:
+        pipeline.append({"$match": entry_filter})
+    pipeline += [
+        {
+            "$addFields": {
+                "animes.anime_int_id": {
+                    "$convert": {
+                        "input": "$animes.anime_id",
+                        "to": "int",
+                        "onError": None,
+                    }
+                }
+            }
+        },
+        {"$sort": {"animes.watched_at": -1 if newest_first else 1}},
+    ]
+    if skip or limit is not None:
+        pipeline += [
+            {
+                "$lookup": {
+                    "from": "animes",
+                    "localField": "animes.anime_int_id",
+                    "foreignField": "id",
+                    "pipeline": [{"$project": {"_id": 1}}],
+                    "as": "listed",
+                }
+            },
+            {"$match": {"listed": {"$ne": []}}},
+        ]
+    if skip:
+        pipeline.append({"$skip": skip})
+    if limit is not None:
+        pipeline.append({"$limit": limit})
+
+    pipeline += [
+        {
+            "$lookup": {
+                "from": "animes",
+                "localField": "animes.anime_int_id",
+                "foreignField": "id",
+                "pipeline": [{"$project": ANIME_OUT_PROJECTION}],
+                "as": "anime",
+            }
+        },
+        {"$unwind": "$anime"},
+        {
+            "$addFields": {
+                "anime.user_anime_status": "$animes.user_anime_status",
+                "anime.watched_at": "$animes.watched_at",
+            }
+        },
+        {"$replaceRoot": {"newRoot": "$anime"}},
+    ]
+    return pipeline
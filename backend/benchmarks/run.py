@@ -0,0 +1,309 @@
+"""Load-test the API in-process against local stand-ins.
+
+Seeds a scratch database by ingesting generated AniList fixtures, then
+drives every scenario at a fixed concurrency through the ASGI app and
+reports throughput and latency percentiles. Run from ``backend/``::
+
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run --threshold 0.25
+"""
+
+import argparse
+import asyncio
+import json
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from benchmarks.scenarios import SCENARIOS, Scenario, Workload
+from benchmarks.standins import (
+    BENCH_DB_NAME,
+    BenchAuth,
+    catalog_titles,
+    configure_environment,
+    insert_fixtures,
+    make_workdir,
+    use_in_memory_mongo,
+    write_anilist_fixtures,
+)
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+# Settings that must match for a baseline comparison to mean anything.
+COMPARED_SETTINGS = ("concurrency", "requests", "animes", "llm_latency_ms", "in_memory")
+
+
+async def drive(
+    client,
+    scenario: Scenario,
+    workload: Workload,
+    concurrency: int,
+    requests: int,
+    iterations: List[int],
+) -> dict:
+    """Issue ``requests`` requests from ``concurrency`` workers at once."""
+    latencies = []
+    errors = []
+    remaining = requests
+
+    async def worker(n: int):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            request = scenario.build(workload, n, iterations[n])
+            iterations[n] += 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                if response.status_code not in scenario.expected:
+                    errors.append(f"{response.status_code} {response.text[:200]}")
+            except Exception as e:
+                errors.append(repr(e))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {
+        "router": scenario.router,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "firstError": errors[0] if errors else None,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 1),
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+    }
+
+
+async def seed_watchlists(client, workload: Workload, size: int):
+    # The last ``concurrency`` anime are left out for watchlist_add_remove.
+    ids = workload.anime_ids[: -len(workload.tokens)]
+    for worker in range(len(workload.tokens)):
+        seeded = [ids[(worker * 7 + k) % len(ids)] for k in range(size)]
+        for anime_id in seeded:
+            response = await client.post(
+                "/v1/watchlist/add",
+                params={"anime_id": str(anime_id)},
+                headers=workload.auth(worker),
+            )
+            response.raise_for_status()
+        workload.seeded.append(seeded)
+
+
+async def run(args, workdir: Path, auth: BenchAuth) -> Dict[str, dict]:
+    # The app reads its configuration at import time, so it can only be
+    # imported once configure_environment has run.
+    import httpx
+    from app.dependencies import close_mongo_connection, connect_to_mongo, get_db
+    from app.main import app
+    from app.utils.ingestion import fixture_transport, run_ingestion
+
+    if args.in_memory:
+        use_in_memory_mongo()
+    await connect_to_mongo().drop_database(BENCH_DB_NAME)
+
+    fixtures = workdir / "anilist"
+    fixtures.mkdir()
+    write_anilist_fixtures(fixtures, args.animes, args.per_page)
+    if args.in_memory:
+        stats = await insert_fixtures(get_db(), fixtures)
+    else:
+        stats = await run_ingestion(
+            get_db(),
+            per_page=args.per_page,
+            start_page=1,
+            transport=fixture_transport(fixtures),
+        )
+    print(f"📦 Ingested {stats['animes']} animes in {stats['seconds']}s")
+
+    workload = Workload(
+        titles=catalog_titles(fixtures),
+        tokens=[auth.token(f"benchmark|user-{n}") for n in range(args.concurrency)],
+    )
+    selected = [
+        scenario
+        for scenario in SCENARIOS
+        if not args.scenarios
+        or scenario.name in args.scenarios
+        or scenario.router in args.scenarios
+    ]
+
+    results = {}
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://benchmark", timeout=60.0
+            ) as client:
+                await seed_watchlists(client, workload, args.watchlist_size)
+                for scenario in selected:
+                    iterations = [0] * args.concurrency
+                    if args.warmup:
+                        await drive(
+                            client,
+                            scenario,
+                            workload,
+                            args.concurrency,
+                            args.warmup,
+                            iterations,
+                        )
+                    results[scenario.name] = await drive(
+                        client,
+                        scenario,
+                        workload,
+                        args.concurrency,
+                        args.requests,
+                        iterations,
+                    )
+                    print_result(scenario.name, results[scenario.name])
+    finally:
+        close_mongo_connection()
+    return results
+
+
+def print_result(name: str, result: dict):
+    print(
+        f"{name:<30} {result['throughput']:>9.1f} req/s"
+        f"  p50 {result['p50']:>8.2f}  p95 {result['p95']:>8.2f}"
+        f"  p99 {result['p99']:>8.2f} ms  errors {result['errors']}"
+    )
+    if result["firstError"]:
+        print(f"  first error: {result['firstError']}")
+
+
+def failures(results: Dict[str, dict]) -> List[str]:
+    """Scenarios with any failed request; their timings mean nothing."""
+    return [
+        f"{name}: {result['errors']}/{result['requests']} errors, first: "
+        f"{result['firstError']}"
+        for name, result in results.items()
+        if result["errors"]
+    ]
+
+
+def compare(
+    results: Dict[str, dict], baseline: Dict[str, dict], threshold: float
+) -> List[str]:
+    """Scenarios whose p95 or throughput got worse than allowed."""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if current["p95"] > before["p95"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {before['p95']:.2f} -> {current['p95']:.2f} ms"
+            )
+        if current["throughput"] < before["throughput"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {before['throughput']:.1f} -> "
+                f"{current['throughput']:.1f} req/s"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the API routers against local stand-ins for "
+        "MongoDB, Gemini, OpenRouter, Auth0 and AniList."
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--requests", type=int, default=400, help="Timed requests per scenario."
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=40, help="Untimed requests per scenario."
+    )
+    parser.add_argument("--animes", type=int, default=1000)
+    parser.add_argument("--per-page", type=int, default=50)
+    parser.add_argument("--watchlist-size", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument(
+        "--scenarios",
+        type=lambda value: value.split(","),
+        default=None,
+        help="Comma-separated scenario or router names (animes, watchlist, ping).",
+    )
+    parser.add_argument(
+        "--mongo-uri",
+        default="mongodb://localhost:27017",
+        help=f"Local MongoDB to use; its {BENCH_DB_NAME!r} database is dropped.",
+    )
+    parser.add_argument(
+        "--in-memory",
+        action="store_true",
+        help="Use mongomock (uv sync --group dev) instead of a MongoDB server.",
+    )
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store this run as the baseline instead of comparing against it.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed relative p95 and throughput regression before failing.",
+    )
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    if args.animes <= args.concurrency + args.watchlist_size:
+        parser.error("--animes must exceed --concurrency plus --watchlist-size")
+
+    settings = {name: getattr(args, name) for name in COMPARED_SETTINGS}
+    workdir = make_workdir()
+    try:
+        configure_environment(
+            args.mongo_uri, args.llm_latency_ms, workdir, args.in_memory
+        )
+        auth = BenchAuth(workdir)
+        results = asyncio.run(run(args, workdir, auth))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"settings": settings, "results": results}
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    failed = failures(results)
+    if failed:
+        # A failing scenario can neither pass nor become a baseline: its
+        # errors would hide any later regression of the same route.
+        print(f"❌ {len(failed)} scenario(s) had errors:")
+        for failure in failed:
+            print(f"  {failure}")
+        if args.save_baseline:
+            print("Baseline not saved; leave these out with --scenarios.")
+        sys.exit(1)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"💾 Saved baseline to {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline["settings"] != settings:
+        print(f"⚠️ Baseline was recorded with {baseline['settings']}")
+    regressions = compare(results, baseline["results"], args.threshold)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
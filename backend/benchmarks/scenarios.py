@@ -0,0 +1,154 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.standins import GENRES
+
+WATCHLIST_STATUSES = ["watching", "completed", "paused", "dropped", "planned"]
+
+
+@dataclass
+class Workload:
+    """What the scenarios can reference: catalog titles and per-worker users."""
+
+    titles: Dict[int, str]
+    tokens: List[str]
+    # Anime each worker's user had in its watchlist before the run.
+    seeded: List[List[int]] = field(default_factory=list)
+
+    @property
+    def anime_ids(self) -> List[int]:
+        return list(self.titles)
+
+    def auth(self, worker: int) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[worker]}"}
+
+    def title(self, i: int) -> str:
+        ids = self.anime_ids
+        return self.titles[ids[i % len(ids)]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    router: str
+    # (workload, worker, iteration) -> keyword arguments for client.request
+    build: Callable[[Workload, int, int], dict]
+    expected: Tuple[int, ...] = (200,)
+
+
+def get(path: str, **kwargs) -> dict:
+    return {"method": "GET", "url": path, **kwargs}
+
+
+def post(path: str, **kwargs) -> dict:
+    return {"method": "POST", "url": path, **kwargs}
+
+
+def toggle_watchlist(w: Workload, worker: int, i: int) -> dict:
+    # Alternate adding and removing an anime outside the seeded entries, so
+    # every request succeeds and the list does not grow during the run.
+    anime_id = w.anime_ids[-1 - worker]
+    if i % 2 == 0:
+        return post(
+            "/v1/watchlist/add",
+            params={"anime_id": str(anime_id)},
+            headers=w.auth(worker),
+        )
+    return {
+        "method": "DELETE",
+        "url": f"/v1/watchlist/{anime_id}",
+        "headers": w.auth(worker),
+    }
+
+
+SCENARIOS = [
+    Scenario("ping", "ping", lambda w, worker, i: get("/v1/ping")),
+    Scenario(
+        "ping_private",
+        "ping",
+        lambda w, worker, i: get("/v1/ping/private", headers=w.auth(worker)),
+    ),
+    Scenario(
+        "animes_list",
+        "animes",
+        lambda w, worker, i: get("/v1/animes", params={"page": i % 10 + 1}),
+    ),
+    Scenario(
+        "animes_list_filtered",
+        "animes",
+        lambda w, worker, i: get(
+            "/v1/animes",
+            params={"genre": GENRES[i % len(GENRES)], "min_score": 60},
+        ),
+    ),
+    Scenario("animes_genres", "animes", lambda w, worker, i: get("/v1/animes/genres")),
+    Scenario(
+        "animes_top_rated", "animes", lambda w, worker, i: get("/v1/animes/top-rated")
+    ),
+    Scenario("animes_random", "animes", lambda w, worker, i: get("/v1/animes/random")),
+    Scenario(
+        "animes_by_name",
+        "animes",
+        lambda w, worker, i: get(f"/v1/animes/{w.title(i)}"),
+    ),
+    Scenario(
+        "animes_search",
+        "animes",
+        lambda w, worker, i: get(
+            "/v1/animes/search", params={"query": w.title(i).rsplit(" ", 1)[0]}
+        ),
+    ),
+    Scenario(
+        "animes_recommend_description",
+        "animes",
+        lambda w, worker, i: post(
+            "/v1/animes/recommendations",
+            params={"query": f"a {w.title(i).lower()} adventure", "top_k": 10},
+        ),
+    ),
+    Scenario(
+        "animes_recommend_name",
+        "animes",
+        lambda w, worker, i: post(
+            "/v1/animes/recommendations",
+            params={"query": w.title(i), "mode": "anime_name", "top_k": 10},
+        ),
+    ),
+    Scenario(
+        "animes_chatbot",
+        "animes",
+        lambda w, worker, i: post(
+            "/v1/animes/chatbot",
+            json={
+                "message": f"Something like {w.title(i)}?",
+                "session_id": f"bench-{worker}",
+            },
+        ),
+    ),
+    Scenario(
+        "watchlist_list",
+        "watchlist",
+        lambda w, worker, i: get(
+            "/v1/watchlist/", params={"per_page": 50}, headers=w.auth(worker)
+        ),
+    ),
+    Scenario(
+        "watchlist_item",
+        "watchlist",
+        lambda w, worker, i: get(
+            f"/v1/watchlist/{w.seeded[worker][i % len(w.seeded[worker])]}",
+            headers=w.auth(worker),
+        ),
+    ),
+    Scenario(
+        "watchlist_update",
+        "watchlist",
+        lambda w, worker, i: {
+            "method": "PUT",
+            "url": f"/v1/watchlist/{w.seeded[worker][i % len(w.seeded[worker])]}",
+            "params": {"new_status": WATCHLIST_STATUSES[i % len(WATCHLIST_STATUSES)]},
+            "headers": w.auth(worker),
+        },
+    ),
+    Scenario("watchlist_add_remove", "watchlist", toggle_watchlist),
+]
@@ -0,0 +1,91 @@
+"""Time the ways a get_animes page can be turned into JSON bytes.
+
+python -m benchmarks.serialization --items 100 --description-words 400
+"""
+
+import argparse
+import json
+import random
+import timeit
+
+from app.schemas.animes import AnimesListResponse
+from app.utils.anime_api import prepare_anime
+from app.utils.anime_rows import to_anime_out
+from benchmarks.standins import WORDS, fake_media
+from pydantic_core import to_json
+
+
+def anime_row(anime_id: int, description_words: int, rng: random.Random) -> dict:
+    """A row as the get_animes query returns it after to_anime_out."""
+    media = fake_media(anime_id, rng)
+    prepare_anime(media)
+    media["description"] = " ".join(rng.choices(WORDS, k=description_words))
+    media["title"]["display_romaji"] = media["title"]["romaji"]
+    media["title"]["display_english"] = media["title"]["english"]
+    return to_anime_out(media)
+
+
+def animes_page(items: int, description_words: int) -> dict:
+    rng = random.Random(7)
+    results = [anime_row(i, description_words, rng) for i in range(1, items + 1)]
+    return {
+        "results": results,
+        "total": 20000,
+        "page": 1,
+        "perPage": items,
+        "totalPages": 20000 // items,
+        "nextCursor": None,
+    }
+
+
+def response_model_path(payload: dict) -> bytes:
+    # What FastAPI does for a returned dict: validate against the
+    # response_model, dump to JSON-able Python, then json.dumps.
+    model = AnimesListResponse.model_validate(payload)
+    return json.dumps(model.model_dump(mode="json")).encode()
+
+
+def validated_path(payload: dict) -> bytes:
+    return AnimesListResponse.model_validate(payload).model_dump_json().encode()
+
+
+def fast_path(payload: dict) -> bytes:
+    return to_json(payload)
+
+
+PATHS = {
+    "response_model + json.dumps": response_model_path,
+    "model_dump_json (validated)": validated_path,
+    "to_json (fast)": fast_path,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare JSON serialization paths for one get_animes page."
+    )
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--description-words", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    payload = animes_page(args.items, args.description_words)
+    expected = json.loads(validated_path(payload))
+    for serialize in PATHS.values():
+        assert json.loads(serialize(payload)) == expected
+
+    size = len(fast_path(payload))
+    print(f"{args.items} animes, {size / 1024:.0f} KiB of JSON per page")
+    baseline = None
+    for name, serialize in PATHS.items():
+        runs = timeit.repeat(
+            lambda: serialize(payload), repeat=args.repeat, number=args.number
+        )
+        per_call = min(runs) / args.number * 1e6
+        baseline = baseline or per_call
+        print(f"{name:<30} {per_call:>9.1f} µs  {baseline / per_call:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Local stand-ins for every external service the API talks to.
+
+``configure_environment`` must run before anything under ``app`` is
+imported, because the app reads its configuration into module constants.
+"""
+
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+BENCH_DB_NAME = "anime_benchmark"
+BENCH_AUTH0_DOMAIN = "benchmark.invalid"
+BENCH_AUDIENCE = "anime-benchmark"
+BENCH_KID = "benchmark-key"
+
+GENRES = [
+    "Action",
+    "Adventure",
+    "Comedy",
+    "Drama",
+    "Fantasy",
+    "Horror",
+    "Mystery",
+    "Romance",
+    "Sci-Fi",
+    "Slice of Life",
+    "Sports",
+    "Supernatural",
+]
+SEASONS = ["WINTER", "SPRING", "SUMMER", "FALL"]
+WORDS = (
+    "sky blade moon shadow spirit academy hero dragon star ocean city "
+    "garden knight witch signal summer winter last first lost silent"
+).split()
+
+
+def configure_environment(
+    mongo_uri: str, llm_latency_ms: float, workdir: Path, in_memory: bool = False
+):
+    """Point the app at a scratch database, fake embedder, fake LLM and local keys.
+
+    The Mongo URI is always set explicitly so a developer's ``.env`` can
+    never send the benchmark (which drops its database) at a real cluster.
+    """
+    os.environ["MONGODB_URI"] = mongo_uri
+    os.environ["MONGODB_DB_NAME"] = BENCH_DB_NAME
+    os.environ["EMBEDDING_BACKEND"] = "hash"
+    os.environ["CHAT_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(llm_latency_ms)
+    os.environ["AUTH0_DOMAIN"] = BENCH_AUTH0_DOMAIN
+    os.environ["AUTH0_API_AUDIENCE"] = BENCH_AUDIENCE
+    os.environ["AUTH0_JWKS_FILE"] = str(workdir / "jwks.json")
+    # $vectorSearch only exists on Atlas; search the in-process index.
+    os.environ.setdefault("VECTOR_SEARCH_BACKEND", "exact")
+    os.environ.setdefault("EMBEDDING_DIM", "768")
+    if in_memory:
+        # The persistent tier writes with bulk upserts, which mongomock
+        # cannot run (see insert_fixtures).
+        os.environ["EMBEDDING_CACHE_PERSISTENT"] = "none"
+
+
+class BenchAuth:
+    """Signs Auth0-shaped access tokens with a throwaway RSA key."""
+
+    def __init__(self, workdir: Path):
+        from authlib.jose import JsonWebKey
+
+        self.key = JsonWebKey.generate_key(
+            "RSA", 2048, options={"kid": BENCH_KID}, is_private=True
+        )
+        public = self.key.as_dict(is_private=False)
+        public.update({"kid": BENCH_KID, "alg": "RS256", "use": "sig"})
+        (workdir / "jwks.json").write_text(json.dumps({"keys": [public]}))
+
+    def token(self, user_id: str, ttl_seconds: int = 3600) -> str:
+        from authlib.jose import jwt
+
+        now = int(time.time())
+        claims = {
+            "sub": user_id,
+            "aud": BENCH_AUDIENCE,
+            "iss": f"https://{BENCH_AUTH0_DOMAIN}/",
+            "iat": now,
+            "exp": now + ttl_seconds,
+        }
+        header = {"alg": "RS256", "kid": BENCH_KID}
+        return jwt.encode(header, claims, self.key).decode()
+
+
+def fake_media(anime_id: int, rng: random.Random) -> dict:
+    words = rng.sample(WORDS, 3)
+    romaji = " ".join(words).title() + f" {anime_id}"
+    return {
+        "id": anime_id,
+        "title": {"romaji": romaji, "english": f"The {romaji}"},
+        "synonyms": [],
+        "description": (
+            f"<p>A {rng.choice(WORDS)} story about a {words[0]} "
+            f"and a {words[1]} in search of the {words[2]}.</p>"
+        ),
+        "genres": rng.sample(GENRES, rng.randint(1, 3)),
+        "averageScore": rng.randint(35, 95),
+        "episodes": rng.choice([1, 12, 13, 24, 26, 50]),
+        "duration": rng.choice([12, 24, 25, 110]),
+        "season": rng.choice(SEASONS),
+        "seasonYear": rng.randint(1995, 2025),
+        "status": rng.choice(["FINISHED", "RELEASING"]),
+        "source": rng.choice(["MANGA", "ORIGINAL", "LIGHT_NOVEL"]),
+        "studios": {"nodes": [{"name": f"Studio {rng.choice(WORDS).title()}"}]},
+        "coverImage": {"large": f"https://img.invalid/{anime_id}.jpg"},
+    }
+
+
+def write_anilist_fixtures(
+    fixtures_dir: Path, animes: int, per_page: int, seed: int = 7
+) -> int:
+    """Write ``page_<n>.json`` files in AniList's response shape.
+
+    They are served by ``app.utils.ingestion.fixture_transport``, the same
+    fixture server ``fetch_anime.py --fixtures`` uses.
+    """
+    rng = random.Random(seed)
+    pages = (animes + per_page - 1) // per_page
+    for page in range(1, pages + 1):
+        first = (page - 1) * per_page + 1
+        last = min(page * per_page, animes)
+        media = [fake_media(anime_id, rng) for anime_id in range(first, last + 1)]
+        body = {
+            "data": {
+                "Page": {"pageInfo": {"hasNextPage": page < pages}, "media": media}
+            }
+        }
+        (fixtures_dir / f"page_{page}.json").write_text(json.dumps(body))
+    return pages
+
+
+def use_in_memory_mongo():
+    """Swap the app's Mongo client for mongomock, if it is installed.
+
+    mongomock lacks some aggregation stages ($convert, $vectorSearch) and
+    cannot run bulk upserts with pymongo >= 4.11, so the catalog is seeded
+    with insert_fixtures and scenarios that need those stages fail the run
+    (pick the others with --scenarios). Use a local mongod for numbers worth
+    comparing.
+    """
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("--in-memory needs the dev dependencies: uv sync --group dev")
+
+    import app.dependencies as dependencies
+
+    dependencies._client = AsyncMongoMockClient()
+
+
+def make_workdir() -> Path:
+    return Path(tempfile.mkdtemp(prefix="anime-bench-"))
+
+
+async def insert_fixtures(db, fixtures_dir: Path) -> dict:
+    """Seed the catalog from fixtures with plain inserts instead of ingestion.
+
+    Ingestion upserts through ``bulk_write``; mongomock's bulk builder does
+    not accept the ``sort`` argument pymongo >= 4.11 passes, so in-memory
+    runs embed the same pages and ``insert_many`` them into an empty
+    database.
+    """
+    from app.utils.anime_api import build_anime_documents
+    from app.utils.response_cache import catalog_version
+
+    started = time.perf_counter()
+    animes = 0
+    for fixture in sorted(fixtures_dir.glob("page_*.json")):
+        media = json.loads(fixture.read_text())["data"]["Page"]["media"]
+        documents = await build_anime_documents(media)
+        if documents:
+            await db.animes.insert_many(documents)
+            animes += len(documents)
+    await catalog_version.bump(db)
+    return {"animes": animes, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def catalog_titles(fixtures_dir: Path) -> Dict[int, str]:
+    titles = {}
+    for fixture in sorted(fixtures_dir.glob("page_*.json")):
+        for media in json.loads(fixture.read_text())["data"]["Page"]["media"]:
+            titles[media["id"]] = media["title"]["romaji"]
+    return titles
@@ -0,0 +1,31 @@
+import argparse
+import asyncio
+import time
+
+from app.dependencies import close_mongo_connection, get_db
+from app.utils.neighbors import NEIGHBORS_BLOCK_SIZE, NEIGHBORS_TOP_N, build_neighbors
+
+
+async def run(top_n: int, block_size: int):
+    started = time.perf_counter()
+    count = await build_neighbors(get_db(), top_n=top_n, block_size=block_size)
+    elapsed = time.perf_counter() - started
+    print(f"🎉 Stored {top_n} neighbours for {count} animes in {elapsed:.1f}s.")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute the nearest anime of every anime into anime_neighbors."
+    )
+    parser.add_argument("--top-n", type=int, default=NEIGHBORS_TOP_N)
+    parser.add_argument("--block-size", type=int, default=NEIGHBORS_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args.top_n, args.block_size))
+    finally:
+        close_mongo_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import sys
+
+from app.dependencies import close_mongo_connection, get_db
+from app.utils.indexes import (
+    INDEXES,
+    unique_key,
+    check_hot_queries,
+    ensure_indexes,
+    find_duplicates,
+    remove_duplicates,
+)
+
+
+async def check_duplicates(db, dedupe: bool) -> int:
+    """Report (or remove) documents that would block a unique index."""
+    blocked = 0
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            key = unique_key(index)
+            if not key:
+                continue
+            collection = db[collection_name]
+            if dedupe:
+                removed = await remove_duplicates(collection, key)
+                if removed:
+                    print(f"🧹 Removed {removed} duplicate {collection_name} documents")
+                continue
+            groups = await find_duplicates(collection, key)
+            if groups:
+                blocked += 1
+                sample = ", ".join(str(group["_id"]) for group in groups[:5])
+                print(
+                    f"❌ {len(groups)} duplicate {key!r} values in {collection_name} "
+                    f"(e.g. {sample}); rerun with --dedupe to keep the oldest of each"
+                )
+    return blocked
+
+
+async def main(dedupe: bool) -> int:
+    db = get_db()
+    blocked = await check_duplicates(db, dedupe)
+    await ensure_indexes(db)
+    failures = await check_hot_queries(db)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ All hot queries use an index.")
+    return 1 if failures or blocked else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Create the app's indexes and check hot queries use them."
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Delete duplicate documents blocking a unique index first.",
+    )
+    args = parser.parse_args()
+    try:
+        code = asyncio.run(main(args.dedupe))
+    finally:
+        close_mongo_connection()
+    sys.exit(code)
@@ -0,0 +1,108 @@
+"""Hammer one watchlist with concurrent adds, updates and deletes.
+
+Checks that no change is lost: the user ends up with exactly one
+watchlist document, holding every anime that was added and not deleted,
+with its last status, and a taste document whose weights agree with it.
+Uses a throwaway user id and removes its documents afterwards.
+"""
+
+import argparse
+import asyncio
+import sys
+import uuid
+
+from app.dependencies import close_mongo_connection, get_db
+from app.routers.watchlist import (
+    add_to_watchlist,
+    delete_from_watchlist,
+    update_watchlist_item,
+)
+from app.schemas.animes import AnimeStatus
+from app.utils.taste import status_weight
+from fastapi import HTTPException
+
+
+async def attempt(call) -> int:
+    try:
+        await call
+        return 200
+    except HTTPException as e:
+        return e.status_code
+
+
+async def run(db, user_id: str, animes: int, copies: int) -> list:
+    anime_ids = [str(900_000_000 + n) for n in range(animes)]
+    kept, deleted = anime_ids[::2], anime_ids[1::2]
+
+    # Every anime added ``copies`` times at once: one add wins per anime.
+    adds = await asyncio.gather(
+        *(
+            attempt(add_to_watchlist(anime_id, AnimeStatus.PLANNED, user_id, db))
+            for anime_id in anime_ids
+            for _ in range(copies)
+        )
+    )
+    failures = []
+    if adds.count(200) != animes:
+        failures.append(f"{adds.count(200)} adds succeeded, expected {animes}")
+
+    # Half the list is updated while the other half is deleted.
+    await asyncio.gather(
+        *(
+            attempt(update_watchlist_item(AnimeStatus.COMPLETED, anime_id, user_id, db))
+            for anime_id in kept
+        ),
+        *(attempt(delete_from_watchlist(anime_id, user_id, db)) for anime_id in deleted),
+    )
+
+    documents = await db.watchlist.count_documents({"user_id": user_id})
+    if documents != 1:
+        failures.append(f"{documents} watchlist documents, expected 1")
+
+    watchlist = await db.watchlist.find_one({"user_id": user_id}) or {}
+    statuses = {
+        item["anime_id"]: item.get("user_anime_status")
+        for item in watchlist.get("animes", [])
+    }
+    if sorted(statuses) != sorted(kept):
+        failures.append(f"watchlist holds {len(statuses)} animes, expected {len(kept)}")
+    if any(status != AnimeStatus.COMPLETED.value for status in statuses.values()):
+        failures.append("an update to completed was lost")
+
+    taste = await db.user_taste.find_one({"_id": user_id}) or {}
+    expected = {anime_id: status_weight(AnimeStatus.COMPLETED) for anime_id in kept}
+    if taste.get("weights") != expected:
+        failures.append("taste weights disagree with the watchlist")
+    return failures
+
+
+async def main(animes: int, copies: int) -> int:
+    db = get_db()
+    user_id = f"concurrency-check|{uuid.uuid4()}"
+    try:
+        failures = await run(db, user_id, animes, copies)
+    finally:
+        await db.watchlist.delete_many({"user_id": user_id})
+        await db.user_taste.delete_many({"_id": user_id})
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ No lost or duplicated watchlist updates.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check concurrent watchlist changes against the configured MongoDB."
+    )
+    parser.add_argument("--animes", type=int, default=40)
+    parser.add_argument(
+        "--copies", type=int, default=3, help="Concurrent adds of each anime."
+    )
+    args = parser.parse_args()
+    try:
+        code = asyncio.run(main(args.animes, args.copies))
+    finally:
+        close_mongo_connection()
+    sys.exit(code)
@@ -1,37 +1,61 @@
-import time
-import requests
+import argparse
+import asyncio
+from pathlib import Path
 
-API_URL = "http://localhost:8000/animes/fetch"  # Change to your correct endpoint
-INTERVAL_SECONDS = 15  # Time gap between calls
-START_PAGE = 1
-PER_PAGE = 10  # Adjust per your API
-MAX_PAGES = 9  # ✅ stop after 50 pages
+from app.dependencies import close_mongo_connection, get_db
+from app.utils.ingestion import (
+    INGEST_CONCURRENCY,
+    INGEST_PER_PAGE,
+    fixture_transport,
+    run_ingestion,
+)
 
 
-def fetch_anime(page, per_page):
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fetch anime from AniList, embed them and upsert them into MongoDB."
+    )
+    parser.add_argument("--per-page", type=int, default=INGEST_PER_PAGE)
+    parser.add_argument("--concurrency", type=int, default=INGEST_CONCURRENCY)
+    parser.add_argument("--max-pages", type=int, default=None)
+    parser.add_argument(
+        "--start-page",
+        type=int,
+        default=None,
+        help="Ignore the saved checkpoint and start from this page.",
+    )
+    parser.add_argument(
+        "--fixtures",
+        type=Path,
+        default=None,
+        help="Serve AniList responses from recorded page_<n>.json files.",
+    )
+    parser.add_argument(
+        "--record",
+        type=Path,
+        default=None,
+        help="Save every AniList response as page_<n>.json in this directory.",
+    )
+    args = parser.parse_args()
+
+    if args.record:
+        args.record.mkdir(parents=True, exist_ok=True)
+
     try:
-        response = requests.post(
-            f"{API_URL}?perPage={per_page}"
+        stats = asyncio.run(
+            run_ingestion(
+                get_db(),
+                per_page=args.per_page,
+                concurrency=args.concurrency,
+                max_pages=args.max_pages,
+                start_page=args.start_page,
+                transport=fixture_transport(args.fixtures) if args.fixtures else None,
+                record_dir=args.record,
+            )
         )
-
-        if response.status_code == 201:
-            data = response.json()
-            print(f"✅ Page {page}: {data}")
-        else:
-            print(
-                f"❌ Failed for page {page}: Status {response.status_code}, {response.text}")
-    except Exception as e:
-        print(f"⚠️ Error for page {page}: {e}")
-
-
-def main():
-    page = START_PAGE
-    while page <= MAX_PAGES:
-        fetch_anime(page, PER_PAGE)
-        page += 1
-        if page <= MAX_PAGES:
-            time.sleep(INTERVAL_SECONDS)
-    print("🎉 Finished fetching all pages.")
+        print(f"🎉 Finished fetching: {stats}")
+    finally:
+        close_mongo_connection()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+
+from app.dependencies import close_mongo_connection, get_db
+from app.utils.embedding_codec import embedding_fields
+from pymongo import UpdateOne
+
+BATCH_SIZE = 500
+
+
+async def migrate(storage: str, batch_size: int):
+    anime_collection = get_db().animes
+    # Only legacy documents still hold the embedding as an array of doubles.
+    query = {"embedding": {"$type": "array", "$ne": []}}
+    total = await anime_collection.count_documents(query)
+    print(f"🔄 Converting {total} embeddings to {storage}")
+
+    converted = 0
+    batch = []
+    cursor = anime_collection.find(query, {"_id": 1, "embedding": 1})
+    async for doc in cursor:
+        batch.append(
+            UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": embedding_fields(doc["embedding"], storage)},
+            )
+        )
+        if len(batch) >= batch_size:
+            await anime_collection.bulk_write(batch, ordered=False)
+            converted += len(batch)
+            print(f"✅ {converted}/{total}")
+            batch = []
+
+    if batch:
+        await anime_collection.bulk_write(batch, ordered=False)
+        converted += len(batch)
+
+    print(f"🎉 Converted {converted} embeddings.")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert stored anime embeddings to packed BSON binary vectors."
+    )
+    parser.add_argument("--storage", choices=["float32", "int8"], default="float32")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(migrate(args.storage, args.batch_size))
+    finally:
+        close_mongo_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -17,14 +17,16 @@ const ChatbotUi = () => {
   const [selectedModel, setSelectedModel] = useState(
     "mistralai/devstral-2512:free"
   );
+  const [sessionId, setSessionId] = useState<string | undefined>();
 
   const mutation = useMutation({
-    mutationFn: (msg: string) => sendChatMessage(msg, selectedModel),
+    mutationFn: (msg: string) => sendChatMessage(msg, selectedModel, sessionId),
     onMutate: (message) => {
       setMessages((prev) => [...prev, { from: "user", text: message }]);
       setInput("");
     },
     onSuccess: (data) => {
+      setSessionId(data.data.session_id);
       const botMsg = { from: "bot", text: data.data.results || "No reply." };
       setMessages((prev) => [...prev, botMsg]);
     },
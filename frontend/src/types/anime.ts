@@ -55,10 +55,11 @@ export type AnimeListResponse = {
 
 export type AnimesListResponse = {
   results: Array<AnimeOut>;
-  total: number;
+  total: number | null;
   page: number;
   perPage: number;
-  totalPages: number;
+  totalPages: number | null;
+  nextCursor?: string | null;
 };
 
 export type GenresResponse = {
@@ -71,6 +72,7 @@ export type MessageResponse = {
 
 export type ChatbotResponse = {
   results: string;
+  session_id?: string;
 };
 
 export enum QueryMode {